@@ -1,115 +1,78 @@
 import asyncio
+import os
 import threading
-import queue
 import time
-import csv
 from  Glove_calibration import *
+from Glove_buffer import RingBuffer, MovingAverage
+from Glove_fit import AngleMapper, load_calibration
+from Glove_recorder import CsvRecorder
+from Glove_render import BlitRenderer
+from Glove_resample import Resampler
+from Glove_metrics import Metrics
+from Glove_stream import GloveStream, split_gaps, DROP_OLDEST, describe_queues
+from Glove_touch import TouchDetector
 import numpy as np
-from datetime import datetime
 
 import matplotlib.pyplot as plt
-from bleak import BleakScanner, BleakClient
 
-CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
+# One BLE connection, shared by everything that needs the glove data
+stream = GloveStream()
 
-# Thread-safe queue to store data for plotting and CSV-writing
-data_queue = queue.Queue()
+# Thread-safe queue to store data for plotting and CSV-writing. Bounded, so a
+# stalled window (dragged, slow redraw) costs the oldest samples instead of
+# memory and seconds of lag; losses are counted and shown on the plot
+data_queue = stream.subscribe(maxsize=4096, policy=DROP_OLDEST, name='plot', gaps=True)
 
 # Event to signal when to stop BLE notifications
 stop_event = threading.Event() 
 
 # Name for CSV file
-csv_filename = f'adc_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-
-# Global variable to store the last accepted timestamp
-last_accepted_time = 0
-desired_rate = 60  # packets per second
-min_interval = 1.0 / desired_rate
-
-def notification_handler(sender, data):
-    global last_accepted_time
-    now = time.perf_counter()  # high-resolution timer
-    if (now - last_accepted_time) < min_interval:
-        return  # skip this packet
-    last_accepted_time = now
-
-    decoded_data = data.decode().split(',')
-    timestamp = datetime.now()
-    try:
-        values = [float(x) for x in decoded_data]
-    except ValueError as e:
-        print(f"Skipping invalid data: {decoded_data}, error: {e}")
-        return
-    data_queue.put((timestamp, values))
-
-async def bleak_main():
-    """
-    - Discover and connect to the BLE device
-    - Start notifications
-    - Remain active until stop_event is signaled
-    """
-    print("Scanning for BLE devices...")
-    devices = await BleakScanner.discover()
-    device = next((d for d in devices if d.name and "jeppe is 2 cool" in d.name.lower()), None)
-    #jeppe is cool
-
-    if not device:
-        print("Device not found. Exiting BLE thread.")
-        return
-
-    print(f"Found device: {device.name} ({device.address}). Attempting to connect...")
-    async with BleakClient(device.address) as client:
-        print(f"Connected to {device.name}!")
-
-        # Start BLE notifications
-        await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
-        print("Notifications started. Waiting for stop_event...")
-
-        # Keep the async loop alive until we set stop_event
-        while not stop_event.is_set():
-            await asyncio.sleep(0.1)
-
-        # Optionally stop notifications if desired
-        await client.stop_notify(CHARACTERISTIC_UUID)
-        print("Stopped notifications.")
-
-    print("BLE thread exiting.")
-
-
-def run_bleak_loop():
-    """Target for the separate thread to run BLE asynchronously."""
-    asyncio.run(bleak_main())
+csv_filename = f'adc_data_{stream.clock.wall.strftime("%Y%m%d_%H%M%S")}.csv'
 
 
 if __name__ == "__main__":
     ### Cockpit ####
-    # A buffer to hold the most recent data for plotting
-    data_buffer = []
-    data_filtered = []
+    # Ring buffers holding the most recent data for plotting (created once we know the channels)
+    time_buffer = None
+    filtered_buffer = None
+    smoother = None
+    resampler = None
+    angle_mapper = None
+    touch = None
     finger_cal = []
-    buffer_size = 1000  # keep up to 100 data points
+    buffer_size = 1000  # keep up to 1000 data points
     filterWindow = 10
-    calibrate_wait = 5 #seconds to measure each finger
+    calibrate_wait = 5 #at most this many seconds to measure each angle, all fingers at once
     fingers = [1,2,3] # using channel 6,7,8,.. respectively
     angles = [0,45,90,110] # angles to put fingers in
     file_name = "Glove_cal.npy"
+    lut_file = "Glove_cal_lut.npz" # nonlinear calibration written next to file_name, used when present
     show_raw_plt = False
     show_Pressure = True
     press_cut_pct = 0.05 # percentage of change resulting in touch sensing
+    release_cut_pct = 0.02 # back within this of the baseline counts as released
+    use_blit = True # redraw only the lines/bars instead of the whole figure
+    sample_rate = 60 # Hz, every packet is resampled to this rate before filtering and plotting
+    show_latency = False # draw per-stage latencies on the angle plot
+    latency_log = None # e.g. 'latency.log' to append latency summaries every 10 s
     
     # Try to find finger/angle calibrations. If none ask to make them
     try:
-        finger_cal = np.load(file_name) # Finger_cal[finger][coef,intercept]
+        finger_cal = load_calibration(lut_file if os.path.exists(lut_file) else file_name) # Finger_cal[finger][coef,intercept] or a lookup table
     except FileNotFoundError:
         print('Seems like you havn\'t calibrated \n Would you like to do so now?')
         usrInput = input('[Y]es/[n]o \n')
         if usrInput.lower() in ['y', 'yes']:
-            asyncio.run(glove_calibrate(calibrate_wait, fingers, angles,file_name))
-            finger_cal = np.load(file_name)
+            asyncio.run(glove_calibrate_adaptive(fingers, angles, file_name, max_seconds=calibrate_wait))
+            finger_cal = load_calibration(lut_file if os.path.exists(lut_file) else file_name)
     time.sleep(2)
+
+    # Latency instrumentation, practically free when disabled
+    metrics = Metrics(enabled=show_latency or latency_log is not None, log_file=latency_log)
+    stream.metrics = metrics
+
     # Start the BLE thread
-    ble_thread = threading.Thread(target=run_bleak_loop, daemon=True)
-    ble_thread.start()
+    ble_thread = stream.start_thread(stop_event)
 
     # --------------------
     # Set up real-time plot
@@ -120,7 +83,24 @@ if __name__ == "__main__":
     fig2, ax2 = plt.subplots(figsize=(12,6))
     if show_Pressure:
         fig1, ax1 = plt.subplots(figsize=(6,3))
-    
+
+    # One renderer per figure; they skip frames without new data
+    renderers = [BlitRenderer(fig2, use_blit)]
+    if show_raw_plt:
+        renderers.append(BlitRenderer(fig, use_blit))
+    if show_Pressure:
+        renderers.append(BlitRenderer(fig1, use_blit))
+    angle_renderer = renderers[0]
+    if show_latency:
+        latency_text = fig2.text(0.01, 0.01, '', fontsize=8, family='monospace', va='bottom')
+        angle_renderer.add(ax2, [latency_text])
+        last_overlay = 0
+    queue_text = fig2.text(0.99, 0.01, '', fontsize=8, ha='right', va='bottom')
+    angle_renderer.add(ax2, [queue_text])
+    queue_report = ''
+    last_queue_check = 0
+    raw_renderer = renderers[1] if show_raw_plt else None
+    pressure_renderer = renderers[-1] if show_Pressure else None
 
     # We’ll initialize lines once we know the number of channels
     lines = []
@@ -128,21 +108,34 @@ if __name__ == "__main__":
     bars = []
     num_channels = 0
 
-    # Track whether we have written the CSV header yet
-    csv_header_written = False
+    # CSV recorder, started once we know the number of channels
+    recorder = None
+    pending_gaps = []  # disconnects not yet marked in the CSV
 
     # For measuring relative time on the X-axis
     first_timestamp = None
 
     try:
         while True:
-            # Retrieve any new data from the queue
-            while not data_queue.empty():
-                timestamp, values = data_queue.get()
-
-                # If this is the first data, set up channels
+            # Retrieve all new data from the queue in one go
+            frame_start = metrics.start()
+            touch_changed = False
+            batch, gaps = split_gaps(data_queue.drain())
+            pending_gaps += gaps
+
+            if batch:
+                # If this is the first data, set up channels and buffers
                 if num_channels == 0:
-                    num_channels = len(values)
+                    num_channels = len(batch[0][1])
+                    time_buffer = RingBuffer(buffer_size, 1)
+                    filtered_buffer = RingBuffer(buffer_size, num_channels)
+                    smoother = MovingAverage(filterWindow + 1, num_channels)  # current sample + filterWindow previous
+                    resampler = Resampler(sample_rate, num_channels)
+                    if len(finger_cal):
+                        angle_mapper = AngleMapper(finger_cal, buffer_size=buffer_size)
+                    pressure_channels = [3 + i for i in range(len(fingers))]  # pressure pads after the stretch sensors
+                    if num_channels > pressure_channels[-1]:
+                        touch = TouchDetector(pressure_channels, press_pct=press_cut_pct, release_pct=release_cut_pct)
 
                 # If we haven't set up the plot lines yet, do it now
                 if (not lines and show_raw_plt) or not lines2:
@@ -174,92 +167,109 @@ if __name__ == "__main__":
                     ax2.set_title('Real-time Angle Data')
                     ax2.legend(loc = 'upper left')
 
+                    angle_renderer.add(ax2, lines2)
+                    if show_raw_plt:
+                        raw_renderer.add(ax, lines)
+                    if show_Pressure:
+                        pressure_renderer.add(ax1, bars)
+                        if touch is not None:
+                            touch.subscribe(lambda event: bars[event.channel - pressure_channels[0]].set_height(int(event.pressed)))
 
-                # If we haven't written the CSV header, do it now
-                if not csv_header_written:
-                    with open(csv_filename, 'w', newline='') as file:
-                        writer = csv.writer(file)
-                        header = ['Timestamp'] + [f'Channel_{i+1}' for i in range(num_channels)]
-                        writer.writerow(header)
-                    csv_header_written = True
-
-                # Append data to buffer
-                if first_timestamp is None:
-                    first_timestamp = timestamp
-                
-                filter_value = np.mean([x[1] for x in data_buffer[-filterWindow:]] + [values],0).tolist()
-
-                
-                data_buffer.append((timestamp, values))
-                data_filtered = data_filtered + [filter_value]
-
-                if len(data_buffer) > buffer_size:
-                    data_buffer.pop(0)
-                    data_filtered.pop(0)
 
-                # Write this data row to CSV (append mode)
-                with open(csv_filename, 'a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([timestamp] + values)
+                # If we haven't started the CSV recorder, do it now
+                if recorder is None:
+                    header = ['Timestamp_ns'] + [f'Channel_{i+1}' for i in range(num_channels)]
+                    recorder = CsvRecorder(csv_filename, header, stop_event=stop_event, clock=stream.clock)
+                    if touch is not None:
+                        touch.subscribe(lambda event: recorder.mark_touch(event.time, event.channel, event.pressed))
 
-            # Update the plot if we have data
-            if data_filtered and (lines or lines2 or bars):
-                # Generate array of times in seconds relative to the first timestamp
-                times = [(dp[0] - first_timestamp).total_seconds() for dp in data_buffer]
+                # Append the whole batch to the buffers
+                if first_timestamp is None:
+                    first_timestamp = batch[0][0]
+                batch = [(t, v) for t, v in batch if len(v) == num_channels]
+                timestamps = np.array([t for t, _ in batch], dtype=np.int64)
+                raw_values = np.array([v for _, v in batch])
+                metrics.record_residency(timestamps)
+
+                started = metrics.start()
+                times, values = resampler.process((timestamps - first_timestamp) / 1e9, raw_values)
+                time_buffer.extend(times)
+                filtered = smoother.process(values)
+                filtered_buffer.extend(filtered)
+                metrics.stop('filter', started)
+
+                # Map only the new samples to angles, all fingers at once
+                if angle_mapper is not None:
+                    started = metrics.start()
+                    angle_mapper.process(filtered)
+                    metrics.stop('angles', started)
+
+                # Hand the data rows to the CSV recorder
+                started = metrics.start()
+                recorder.write_samples(timestamps, raw_values)
+                metrics.stop('record', started)
+
+                # Press/release events for the bars and the CSV
+                if touch is not None:
+                    started = metrics.start()
+                    touch_changed = bool(touch.process(timestamps, raw_values))
+                    metrics.stop('touch', started)
+
+            # Mark intervals where the glove was disconnected
+            if recorder is not None and pending_gaps:
+                for gap in pending_gaps:
+                    recorder.mark_gap(gap.start, gap.end)
+                pending_gaps = []
+
+            # Update the plot if new data arrived
+            new_data = bool(batch) and len(filtered_buffer) > 0
+            if new_data and (lines or lines2 or bars):
+                started = metrics.start()
+                # Time-ordered views of the buffers, no copying
+                times = time_buffer.view()[:, 0]
+                data_filtered = filtered_buffer.view()
 
                 # Update each channel’s line data
                 if show_raw_plt:
                     for i in range(num_channels):
-                        channel_vals = [row[i] for row in data_filtered]
-                        lines[i].set_data(times, channel_vals)
-
-                if finger_cal.any():
-                    for i in range(len(fingers)):
-                        finger_vals = [row[i] for row in data_filtered]
-                        angle_vals = np.array(finger_vals)*finger_cal[i][0] + finger_cal[i][1]
-                        angle_vals[angle_vals<=0] = 0
-                        angle_vals[angle_vals>=110] = 110
-                        lines2[i].set_data(times, angle_vals)
+                        lines[i].set_data(times, data_filtered[:, i])
 
-                if show_Pressure:
+                if angle_mapper is not None:
+                    angle_vals = angle_mapper.view()
                     for i in range(len(fingers)):
-                        bar_vals = [row[3+i] for row in data_filtered]
-
-                        if bar_vals[-1] < 0 or bar_vals[-1] > 900000:
-                            bars[i].set_height(0)
-                        else:
-                            bars[i].set_height(1)
-
-                        #     bars[i].set_height(0)
-                        # if bar_vals[-1] < 0 or bar_vals[-1]>900000 or (bar_vals[-2]-bar_vals[-1])/bar_vals[-2] < -press_cut_pct:
-                        #     bars[i].set_height(0)
-                        # elif (bar_vals[-2]-bar_vals[-1])/bar_vals[-2] > press_cut_pct:
-                        #     bars[i].set_height(1)
-                        # else:
-                        #     continue
-
-                if show_raw_plt:
-                    ax.relim()
-                    ax.autoscale_view()
-                if show_Pressure:
-                    ax1.relim()
-                    ax1.autoscale_view()
-
-
-
-                ax2.relim()
-                ax2.autoscale_view()
-
-            # Redraw the figure
-            if show_raw_plt:
-                fig.canvas.draw()
-                fig.canvas.flush_events()
-            if show_Pressure:
-                fig1.canvas.draw()
-                fig1.canvas.flush_events()
-
-            fig2.canvas.draw()
-            fig2.canvas.flush_events()
+                        lines2[i].set_data(times, angle_vals[:, i])
+
+                metrics.stop('plot_data', started)
+
+                if show_latency and time.monotonic() - last_overlay > 0.5:
+                    latency_text.set_text(metrics.overlay_text())
+                    last_overlay = time.monotonic()
+
+            # Show (and log) samples lost to a stalled window
+            queue_changed = False
+            if time.monotonic() - last_queue_check > 0.5:
+                last_queue_check = time.monotonic()
+                metrics.counters = stream.queue_stats()
+                report = describe_queues(metrics.counters)
+                if report != queue_report:
+                    queue_report = report
+                    queue_text.set_text(report)
+                    queue_changed = True
+                    print(f"Queues: {report}")
+
+            # Redraw the figures (axes are rescaled only when the data leaves them)
+            started = metrics.start()
+            for renderer in renderers:
+                if renderer is pressure_renderer:
+                    renderer.update(touch_changed)
+                elif renderer is angle_renderer:
+                    renderer.update(new_data or queue_changed)
+                else:
+                    renderer.update(new_data)
+            metrics.stop('draw', started)
+            if new_data:
+                metrics.stop('frame', frame_start)
+            metrics.maybe_dump()
 
 
             # If the figure is closed, break
@@ -277,6 +287,11 @@ if __name__ == "__main__":
         stop_event.set()
         ble_thread.join()
 
+        # Flush the remaining rows to disk
+        if recorder is not None:
+            recorder.stop()
+            print(recorder.summary())
+
         # Clean up the plot
         plt.close(fig2)
         print("Done.")
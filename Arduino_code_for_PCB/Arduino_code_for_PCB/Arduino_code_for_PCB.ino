@@ -38,6 +38,13 @@ const float R_TOP_100k    = 100000.0;
 const float R_TOP_4k       = 4200.0;
 const float SUPPLY_VOLTAGE = 3.3;  // 3.3 V
 
+// Set to 1 to send packed binary frames instead of a CSV string.
+// Layout (little-endian, decoded by Glove_decoder.py):
+//   'G','L', type (1 = float32), channel count, uint32 sequence, N x float32
+#define BINARY_FRAMES 0
+#define FRAME_HEADER_SIZE 8
+uint32_t frameSeq = 0;
+
 /*******************************************************************************
  * BLE Server Callbacks
  ******************************************************************************/
@@ -128,6 +135,7 @@ void loop() {
      * 1. Read ADC → Resistance
      ****************************************************/
     String resValues; 
+    float resistances[NUM_CHANNELS];
     for (int i = 0; i < NUM_CHANNELS; i++) {
       int raw = analogRead(ADC_PINS[i]); // 0..4095
       float voltage = (SUPPLY_VOLTAGE * raw) / 4095.0;
@@ -148,6 +156,11 @@ void loop() {
       if(resistance > 1000000){
         resistance = 1000000;
       }
+      resistances[i] = resistance;
+
+#if BINARY_FRAMES
+      continue;
+#endif
 
       // Build CSV of Resistances
       resValues += String(resistance, 1);
@@ -182,6 +195,20 @@ void loop() {
     // Here, we'll do a simple combined string.
     // Format it however you like, e.g.:
     //   "ADC:2.34,3.45,...|IMU:0.1234,0.5678,..."
+#if BINARY_FRAMES
+    // Header + raw float32 resistances (ESP32 is little-endian)
+    uint8_t frame[FRAME_HEADER_SIZE + sizeof(resistances)];
+    frame[0] = 'G';
+    frame[1] = 'L';
+    frame[2] = 1;
+    frame[3] = NUM_CHANNELS;
+    memcpy(frame + 4, &frameSeq, sizeof(frameSeq));
+    memcpy(frame + FRAME_HEADER_SIZE, resistances, sizeof(resistances));
+    frameSeq++;
+
+    pCharacteristic->setValue(frame, sizeof(frame));
+    pCharacteristic->notify();
+#else
     String combinedData = resValues ; //+ "," + imuValues;
 
     // Send that combined string in one characteristic notify
@@ -190,6 +217,7 @@ void loop() {
 
     // Debug
     Serial.println(combinedData);
+#endif
 
     // Optional small delay to not overload BLE
     //delay(50);
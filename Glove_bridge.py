@@ -0,0 +1,274 @@
+"""
+Drive the robot hand (Roboto_hand.ino) from the glove.
+
+The glove readings are turned into finger angles with the calibration in
+Glove_cal_lut.npz (or Glove_cal.npy) and then into servo angles here on the PC, so the hand no
+longer needs resistance ranges hardcoded per glove. The hand gets small
+fixed-size commands and only ever the newest pose. Roboto_hand.ino only
+reads them when built with SERIAL_COMMANDS set to 1.
+
+    python Glove_bridge.py --serial /dev/ttyUSB0
+    python Glove_bridge.py --udp 192.168.4.1:4210
+    GLOVE_REPLAY=synthetic python Glove_bridge.py --loopback
+"""
+import argparse
+import collections
+import os
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from Glove_fit import LUT_FILE, AngleMapper, load_calibration
+from Glove_metrics import Histogram
+
+# magic, number of digits, sequence number, then one servo angle (0-180) per digit
+COMMAND_MAGIC = b'RH'
+MAX_DIGITS = 5
+COMMAND = struct.Struct(f'<2sBI{MAX_DIGITS}B')  # 12 bytes
+
+# Servo angles at 0 and at 110 degrees of finger bend, from init_digits() in Roboto_hand.ino
+DEFAULT_SERVO_SPANS = [(60, 140), (140, 60), (140, 60)]
+
+
+def encode_command(servo_angles, seq: int = 0) -> bytes:
+    angles = np.zeros(MAX_DIGITS, dtype=np.uint8)
+    angles[:len(servo_angles)] = servo_angles
+    return COMMAND.pack(COMMAND_MAGIC, len(servo_angles), seq & 0xFFFFFFFF, *angles.tolist())
+
+
+def decode_command(payload):
+    """(seq, servo angles) from a command, the inverse of encode_command."""
+    magic, count, seq, *angles = COMMAND.unpack(bytes(payload))
+    if magic != COMMAND_MAGIC or count > MAX_DIGITS:
+        raise ValueError(f"not a hand command: {bytes(payload)!r}")
+    return seq, np.array(angles[:count], dtype=np.uint8)
+
+
+class ServoMap:
+    """
+    Glove readings to servo angles for every finger in one go.
+
+    The finger angle (0-110 degrees, from the calibration) is mapped
+    linearly onto each digit's (servo at 0, servo at 110) span, the
+    host-side version of floatMap()/constrain() in the hand firmware.
+    """
+
+    def __init__(self, coef, servo_spans=DEFAULT_SERVO_SPANS, channels=None, max_angle: float = 110.0):
+        self.mapper = AngleMapper(coef, channels=channels, upper=max_angle, buffer_size=1)
+        spans = np.asarray(servo_spans, dtype=np.float64)[:self.mapper.num_fingers]
+        if len(spans) < self.mapper.num_fingers:
+            raise ValueError(f"{self.mapper.num_fingers} calibrated fingers but only {len(spans)} servo spans")
+        self.servo_start = spans[:, 0]
+        self.servo_scale = (spans[:, 1] - spans[:, 0]) / max_angle
+        self.num_digits = len(spans)
+
+    def __call__(self, values):
+        """Servo angles (uint8) for one sample or an (n, num_channels) block."""
+        block = np.atleast_2d(values)
+        servo = self.mapper.map(block) * self.servo_scale + self.servo_start
+        servo = np.rint(servo).astype(np.uint8)
+        return servo[0] if np.ndim(values) == 1 else servo
+
+
+def load_profiles(cal_file: str = 'Glove_cal.npy', servo_spans=DEFAULT_SERVO_SPANS) -> ServoMap:
+    return ServoMap(load_calibration(cal_file), servo_spans)
+
+
+class SerialTransport:
+    """Commands over USB serial to the hand (needs pyserial)."""
+
+    def __init__(self, port: str, baudrate: int = 115200):
+        import serial  # only needed for this transport
+        self.port = serial.Serial(port, baudrate, timeout=0, write_timeout=0.05)
+
+    def send(self, payload: bytes):
+        self.port.write(payload)
+
+    def close(self):
+        self.port.close()
+
+
+class UdpTransport:
+    """Commands as UDP datagrams, one per command."""
+
+    def __init__(self, host: str, port: int):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, payload: bytes):
+        self.socket.sendto(payload, self.address)
+
+    def close(self):
+        self.socket.close()
+
+
+class LoopbackTransport:
+    """Keeps the last `maxlen` commands with their arrival time instead of sending them."""
+
+    def __init__(self, maxlen: int = 1000):
+        self.received = collections.deque(maxlen=maxlen)  # (monotonic_ns, payload)
+
+    def send(self, payload: bytes):
+        self.received.append((time.monotonic_ns(), bytes(payload)))
+
+    def close(self):
+        pass
+
+
+class HandBridge:
+    """
+    Sends the newest servo targets to the hand from a background thread.
+
+        bridge = HandBridge(load_profiles(), UdpTransport('192.168.4.1', 4210))
+        bridge.start()
+        bridge.submit(timestamp_ns, values)   # from the glove loop, never blocks
+        bridge.stop()
+
+    submit() only replaces the pending target, so if the hand link is
+    slower than the glove, older poses are dropped (counted in
+    `coalesced`) rather than queued. At most one command goes out every
+    min_interval seconds, and a pose the hand already has is not sent
+    again. `latency` is a histogram of the time from the glove sample's
+    arrival to its command being handed to the transport.
+    """
+
+    def __init__(self, servo_map: ServoMap, transport, min_interval: float = 0.02):
+        self.servo_map = servo_map
+        self.transport = transport
+        self.min_interval = min_interval
+        self.latency = Histogram()
+        self.sent = 0
+        self.coalesced = 0
+        self.unchanged = 0
+        self.errors = 0
+        self._pending = None
+        self._last_sent = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, timestamp_ns: int, values):
+        """Offer the newest glove sample (monotonic_ns, one row of channel values)."""
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (timestamp_ns, values)
+        self._wake.set()
+
+    def submit_block(self, timestamps_ns, block):
+        """Offer a block of samples; only the newest one can matter to the hand."""
+        if len(block):
+            self.submit(int(timestamps_ns[-1]), block[-1])
+
+    def _take(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._wake.clear()
+        return pending
+
+    def send_pending(self):
+        """Send the pending target now, if there is one. Returns True if a command went out."""
+        pending = self._take()
+        if pending is None:
+            return False
+        timestamp_ns, values = pending
+        servo = self.servo_map(np.asarray(values, dtype=np.float64))
+        if self._last_sent is not None and np.array_equal(servo, self._last_sent):
+            self.unchanged += 1
+            return False
+        try:
+            self.transport.send(encode_command(servo, self.sent))
+        except OSError as e:
+            self.errors += 1
+            print(f"Hand command failed: {e}")
+            return False
+        self.latency.record(time.monotonic_ns() - timestamp_ns)
+        self._last_sent = servo
+        self.sent += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._wake.wait(0.1):
+                continue
+            started = time.monotonic()
+            self.send_pending()
+            # Let newer targets replace each other until the next slot
+            self._stop.wait(max(0.0, self.min_interval - (time.monotonic() - started)))
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='hand-bridge')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.send_pending()
+        self.transport.close()
+
+    def stats(self):
+        return {'sent': self.sent, 'coalesced': self.coalesced, 'unchanged': self.unchanged,
+                'errors': self.errors, 'latency': self.latency.summary()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--serial', metavar='PORT', help='serial port of the hand, e.g. COM5 or /dev/ttyUSB0')
+    target.add_argument('--udp', metavar='HOST:PORT', help='send commands as UDP datagrams')
+    target.add_argument('--loopback', action='store_true', help="don't send anything, just measure")
+    parser.add_argument('--cal', default=LUT_FILE if os.path.exists(LUT_FILE) else 'Glove_cal.npy',
+                        help='finger calibration from Glove_calibration.py, .npz lookup table or linear .npy')
+    parser.add_argument('--rate', type=float, default=50, help='max commands per second')
+    parser.add_argument('--duration', type=float, default=0, help='seconds to run, 0 = until Ctrl-C')
+    args = parser.parse_args(argv)
+
+    from Glove_stream import COALESCE, GloveStream
+
+    if args.serial:
+        transport = SerialTransport(args.serial)
+    elif args.udp:
+        host, port = args.udp.rsplit(':', 1)
+        transport = UdpTransport(host, int(port))
+    else:
+        transport = LoopbackTransport()
+    bridge = HandBridge(load_profiles(args.cal), transport, min_interval=1 / args.rate).start()
+
+    stream = GloveStream()
+    samples = stream.subscribe(policy=COALESCE, name='hand')  # the hand only needs the newest pose
+    stop_event = threading.Event()
+    ble_thread = stream.start_thread(stop_event)
+    started = last_report = time.monotonic()
+    try:
+        while ble_thread.is_alive():
+            if args.duration and time.monotonic() - started >= args.duration:
+                break
+            try:
+                timestamp, values = samples.get(timeout=0.5)
+            except TimeoutError:
+                continue
+            except EOFError:
+                break
+            bridge.submit(timestamp, values)
+            if time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                print(bridge.stats(), samples.stats())
+    except KeyboardInterrupt:
+        print("Keyboard interrupt received. Exiting...")
+    finally:
+        stop_event.set()
+        ble_thread.join()
+        bridge.stop()
+        print(bridge.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed size (buffer_size, num_channels) buffer holding the most recent samples.
+
+    Every row is written twice (at i and i + buffer_size), so the samples in
+    time order are always one contiguous slice of the storage and view()
+    can hand them to matplotlib without copying.
+    """
+
+    def __init__(self, buffer_size: int, num_channels: int, dtype=np.float64):
+        self.buffer_size = buffer_size
+        self.num_channels = num_channels
+        self._data = np.zeros((2 * buffer_size, num_channels), dtype=dtype)
+        self._head = 0   # next row to write, always in [0, buffer_size)
+        self._count = 0  # number of valid rows
+
+    def __len__(self):
+        return self._count
+
+    def extend(self, block):
+        """Append a (n, num_channels) block of samples, oldest first."""
+        block = np.asarray(block, dtype=self._data.dtype).reshape(-1, self.num_channels)
+        n = len(block)
+        if n == 0:
+            return
+        if n > self.buffer_size:
+            block = block[-self.buffer_size:]
+            n = self.buffer_size
+
+        size = self.buffer_size
+        first = min(n, size - self._head)  # rows that fit before wrapping
+        for offset in (0, size):
+            self._data[offset + self._head:offset + self._head + first] = block[:first]
+            self._data[offset:offset + n - first] = block[first:]
+
+        self._head = (self._head + n) % size
+        self._count = min(self._count + n, size)
+
+    def append(self, row):
+        """Append a single sample."""
+        self.extend(np.asarray(row).reshape(1, -1))
+
+    def view(self):
+        """Read-only, time ordered (len, num_channels) view of the buffer."""
+        start = (self._head - self._count) % self.buffer_size
+        out = self._data[start:start + self._count]
+        out.flags.writeable = False
+        return out
+
+    def last(self):
+        """Most recent sample, or None if the buffer is empty."""
+        if self._count == 0:
+            return None
+        return self._data[self._head - 1 + self.buffer_size]
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+
+class MovingAverage:
+    """
+    Streaming boxcar filter over the last `window` samples of every channel.
+
+    Keeps a running sum, so each new sample costs one add and one subtract
+    per channel no matter how large the window or the plot buffer is.
+    Until `window` samples have been seen the mean is taken over the
+    samples available, like np.mean over a short list.
+    """
+
+    # Recompute the running sum from the history every so often so float
+    # rounding can't build up over long sessions
+    RESYNC_INTERVAL = 1 << 16
+
+    def __init__(self, window: int, num_channels: int):
+        self.window = max(1, int(window))
+        self.num_channels = num_channels
+        self._history = np.zeros((0, num_channels))  # last `window` raw samples
+        self._sum = np.zeros(num_channels)
+        self._since_resync = 0
+
+    def process(self, block):
+        """Filter a (n, num_channels) block and return the (n, num_channels) result."""
+        block = np.asarray(block, dtype=np.float64).reshape(-1, self.num_channels)
+        n = len(block)
+        if n == 0:
+            return block.copy()
+
+        h = len(self._history)
+        seq = np.concatenate((self._history, block))
+
+        # Sample h + j enters the window, sample h + j - window leaves it
+        leaving = np.arange(n) + h - self.window
+        dropped = np.zeros_like(block)
+        valid = leaving >= 0
+        dropped[valid] = seq[leaving[valid]]
+
+        sums = self._sum + np.cumsum(block - dropped, axis=0)
+        counts = np.minimum(h + np.arange(1, n + 1), self.window)
+
+        self._history = seq[-self.window:].copy()
+        self._sum = sums[-1]
+        self._since_resync += n
+        if self._since_resync >= self.RESYNC_INTERVAL:
+            self._sum = self._history.sum(axis=0)
+            self._since_resync = 0
+
+        return sums / counts[:, None]
+
+    def reset(self):
+        self._history = np.zeros((0, self.num_channels))
+        self._sum = np.zeros(self.num_channels)
+        self._since_resync = 0
@@ -60,73 +60,238 @@
     
 
 import asyncio
+import collections
+import os
+import time
 import numpy as np
 from datetime import datetime, timedelta
-from bleak import BleakScanner, BleakClient
-from sklearn.linear_model import LinearRegression
+from Glove_collect import ChunkedCollector
+from Glove_fit import AngleTable, fit_linear
+from Glove_stream import GloveStream
 
-CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
 
-async def glove_calibrate(duration_seconds: float, fingers: list, angles: list, file_name: str):
+async def collect_adc_data(duration_seconds: float, path: str = None, stream: GloveStream = None, **tags):
+    """
+    Record duration_seconds of glove data straight to disk.
+
+    Returns a Glove_collect.Collection: iterate it for (timestamp_ns,
+    values) or use .timestamps/.channels as memory-mapped arrays. Connects
+    on its own unless an open stream is given. Extra keyword arguments
+    (finger=1, angle=45, ...) tag the data. Raises RuntimeError if no
+    sample arrived in the window.
+    """
+    own_stream = stream is None
+    if own_stream:
+        stream = GloveStream()
+        await stream.connect()
+    path = path or f'adc_data_{datetime.now():%Y%m%d_%H%M%S}.glv'
+    samples = stream.subscribe(maxsize=4096, name='collect', gaps=True)
+    collector = ChunkedCollector(path, stream.clock, device=stream.name)
+    collector.begin(**tags)
+    was_notifying = stream.notifying
+    await stream.start()
+    try:
+        end_time = time.monotonic() + duration_seconds
+        while time.monotonic() < end_time:
+            await asyncio.sleep(0.1)
+            collector.collect(samples)
+    finally:
+        if not was_notifying:
+            await stream.stop()
+        collector.collect(samples)
+        stream.unsubscribe(samples)
+        if own_stream:
+            await stream.disconnect()
+    collection = collector.close()
+    if collection is None:
+        raise RuntimeError(f"no samples collected in {duration_seconds} s, is the glove sending?")
+    print(f"Collected {len(collection)} samples to {path}")
+    return collection
+
+
+def save_calibration(readings, angles, fingers: list, file_name: str, model: str = 'monotone'):
+    """
+    Fit and save a calibration from (n_fingers, n_angles) mean readings.
+
+    The straight line goes to file_name as before, and the model (see
+    AngleTable.fit) is compiled to a lookup table in <file_name>_lut.npz.
+    The table is written for 'linear' too: everything that loads the
+    calibration prefers the table, so an older one must not outlive a
+    new fit.
+    """
+    fit = fit_linear(readings, angles)
+    finger_cal = fit.coef
+    for i in range(len(fingers)):
+        print(f"Finger {fingers[i]}: R² {fit.r2[i]:.3f}, worst residual {np.abs(fit.residuals[i]).max():.1f} deg")
+    np.save(file_name, finger_cal)
+    lut_file = os.path.splitext(file_name)[0] + '_lut.npz'
+    AngleTable.fit(readings, angles, model=model).save(lut_file)
+    print(f"{model} calibration saved to {lut_file}")
+    return finger_cal
+
+
+async def glove_calibrate(duration_seconds: float, fingers: list, angles: list, file_name: str,
+                          model: str = 'monotone'):
     fingerAngle = np.zeros((len(fingers), len(angles)))
-    finger_cal = np.zeros((len(fingers), 2))
-
-    collecting = False  # Flag to control data collection
-    collected_data = []  # Buffer for the current calibration
-    current_finger = None
-
-    def notification_handler(sender, data):
-        nonlocal collecting
-        if not collecting:
-            return  # Ignore data when not collecting
-        try:
-            values = [float(x) for x in data.decode().split(',')]
-            timestamp = datetime.now()
-            collected_data.append((timestamp, values))
-        except ValueError as e:
-            print(f"Skipping invalid data: {data}, error: {e}")
-
-    print("Scanning for BLE devices...")
-    devices = await BleakScanner.discover()
-    device = next((d for d in devices if d.name and "jeppe is 2 cool" in d.name.lower()), None)
-    if not device:
-        raise RuntimeError("BLE device not found.")
-
-    async with BleakClient(device.address) as client:
-        print(f"Connected to {device.name}. Waiting for calibration instructions...")
-        await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
+
+    async with GloveStream() as stream:
+        print(f"Connected to {stream.name}. Waiting for calibration instructions...")
+        samples = stream.subscribe(maxsize=65536, name='calibration')  # minutes of data, more than any hold
+        samples.pause()  # notifications keep running, samples only count while a step is measured
 
         for i in range(len(fingers)):
             for j in range(len(angles)):
-                input(f"Press Enter to collect data for Finger {fingers[i]} at {angles[j]} degrees...")
-                collecting = True
-                collected_data.clear()  # reset buffer
+                # Wait for the operator in a thread so the event loop keeps serving the glove
+                await asyncio.to_thread(input, f"Press Enter to collect data for Finger {fingers[i]} at {angles[j]} degrees...")
 
                 # Run for specified duration
+                samples.resume()
                 end_time = datetime.now() + timedelta(seconds=duration_seconds)
                 while datetime.now() < end_time:
                     await asyncio.sleep(0.05)
+                samples.pause()
 
-                collecting = False
+                collected_data = samples.drain()
 
                 # Compute mean of the i-th finger's channel
                 fingerAngle[i, j] = np.mean([x[1][i] for x in collected_data])  # average this finger's column
                 print(f"Mean ADC value for finger {fingers[i]} at {angles[j]} deg: {fingerAngle[i, j]}")
 
-            # Fit a simple linear regression per finger
-            model = LinearRegression().fit(
-                fingerAngle[i, :].reshape(-1, 1), angles
-            )
-            finger_cal[i, 0] = model.coef_.item()
-            finger_cal[i, 1] = model.intercept_
-
-        # Save calibration
-        np.save(file_name, finger_cal)
+        # Fit every finger in one go and save the calibration
+        finger_cal = save_calibration(fingerAngle, angles, fingers, file_name, model)
         np.save('Finger_angle', fingerAngle)
         print("Calibration saved!")
 
     return finger_cal
 
+# One adaptive calibration step: per-finger mean and std at one angle
+StepResult = collections.namedtuple('StepResult', ['angle', 'mean', 'std', 'samples', 'seconds', 'stable', 'restarts'])
+
+
+class RunningStats:
+    """Welford mean and variance per channel, updated a block at a time."""
+
+    def __init__(self, num_channels: int):
+        self.num_channels = num_channels
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.mean = np.zeros(self.num_channels)
+        self.m2 = np.zeros(self.num_channels)
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        n_block = len(block)
+        if not n_block:
+            return
+        block_mean = block.mean(axis=0)
+        block_m2 = ((block - block_mean) ** 2).sum(axis=0)
+        n = self.n + n_block
+        delta = block_mean - self.mean
+        self.mean = self.mean + delta * (n_block / n)
+        self.m2 = self.m2 + block_m2 + delta * delta * (self.n * n_block / n)
+        self.n = n
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.full(self.num_channels, np.inf)
+
+    @property
+    def sem(self):
+        """Standard error of the mean per channel."""
+        return np.sqrt(self.variance / max(self.n, 1))
+
+
+async def capture_step(samples, channels, angle: float, min_seconds: float = 0.5, max_seconds: float = 5.0,
+                       tolerance: float = 0.002, motion: float = 0.03, min_samples: int = 10) -> StepResult:
+    """
+    Measure every finger at once until their means settle.
+
+    Reads a resumed Subscription until the standard error of every
+    channel's mean is below `tolerance` times the mean (after at least
+    min_seconds and min_samples), or max_seconds run out. A batch more
+    than `motion` (relative) away from the running mean means a finger
+    moved: the measurement starts over from that batch instead of
+    averaging through it. A step that never settles comes back with
+    stable=False.
+    """
+    channels = np.asarray(channels)
+    stats = RunningStats(len(channels))
+    restarts = 0
+    started = run_started = time.monotonic()
+    converged = False
+    while time.monotonic() - started < max_seconds:
+        await asyncio.sleep(0.05)
+        batch = [v for _, v in samples.drain()]
+        if not batch:
+            continue
+        block = np.asarray(batch, dtype=np.float64)[:, channels]
+        scale = np.maximum(np.abs(stats.mean), 1.0)
+        if stats.n and np.any(np.abs(block.mean(axis=0) - stats.mean) > motion * scale):
+            stats.reset()
+            restarts += 1
+            run_started = time.monotonic()
+        stats.update(block)
+        scale = np.maximum(np.abs(stats.mean), 1.0)
+        if (stats.n >= min_samples and time.monotonic() - run_started >= min_seconds
+                and np.all(stats.sem <= tolerance * scale)):
+            converged = True
+            break
+    std = np.sqrt(stats.variance) if stats.n > 1 else np.zeros(len(channels))
+    return StepResult(angle, stats.mean.copy(), std, stats.n, time.monotonic() - started, converged, restarts)
+
+
+async def glove_calibrate_adaptive(fingers: list, angles: list, file_name: str, max_seconds: float = 5.0,
+                                   channels=None, model: str = 'monotone', **step_options):
+    """
+    Calibrate all fingers together: one step per angle instead of one per finger and angle.
+
+    Each step ends as soon as capture_step() sees every finger settle.
+    When a step doesn't settle, the operator can retry it, keep it anyway,
+    or skip it. The fit uses the steps that were kept. The result is
+    saved like glove_calibrate's, plus Finger_angle.npy.
+    """
+    channels = np.arange(len(fingers)) if channels is None else np.asarray(channels)
+    fingerAngle = np.full((len(fingers), len(angles)), np.nan)
+    results = []
+
+    async with GloveStream() as stream:
+        print(f"Connected to {stream.name}. Waiting for calibration instructions...")
+        samples = stream.subscribe(maxsize=65536, name='calibration')
+        samples.pause()
+
+        for j, angle in enumerate(angles):
+            prompt = f"Put fingers {', '.join(map(str, fingers))} at {angle} degrees and press Enter..."
+            while True:
+                await asyncio.to_thread(input, prompt)
+                samples.resume()
+                result = await capture_step(samples, channels, angle, max_seconds=max_seconds, **step_options)
+                samples.pause()
+                samples.drain()
+                print(f"{angle} deg: {result.samples} samples in {result.seconds:.1f} s, "
+                      f"{result.restarts} restarts, mean {np.round(result.mean, 1).tolist()}")
+                if result.stable:
+                    break
+                answer = (await asyncio.to_thread(
+                    input, "Readings didn't settle. Enter to retry, [k]eep anyway or [s]kip: ")).strip().lower()
+                if answer in ('k', 's'):
+                    break
+            results.append(result)
+            if result.stable or answer == 'k':
+                fingerAngle[:, j] = result.mean
+
+    kept = ~np.isnan(fingerAngle[0])
+    if kept.sum() < 2:
+        raise RuntimeError("need at least two calibrated angles for a fit")
+    finger_cal = save_calibration(fingerAngle[:, kept], np.asarray(angles, dtype=np.float64)[kept],
+                                  fingers, file_name, model)
+    print(f"Calibration took {sum(r.seconds for r in results):.1f} s of measuring, "
+          f"{sum(not r.stable for r in results)} unstable steps.")
+    np.save('Finger_angle', fingerAngle)
+    print("Calibration saved!")
+    return finger_cal
+
 # Usage:
 if __name__ == "__main__":
     finger_cal = asyncio.run(
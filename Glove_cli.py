@@ -0,0 +1,193 @@
+"""
+Command-line entry point for the glove tools.
+
+    python Glove_cli.py record [--duration 60] [--format csv|glv] [--output FILE]
+    python Glove_cli.py view [--mode angle|filter|raw]
+    python Glove_cli.py calibrate [--adaptive] [--model monotone|poly|linear] [--fingers 1 2 3] [--angles 0 45 90 110]
+    python Glove_cli.py analyze adc_data_20250623_130130.csv [--convert] [--plot]
+
+Every subcommand only imports what it needs: record never loads
+matplotlib, and nothing loads a GUI backend until a window is opened.
+--replay FILE (or 'synthetic') runs any subcommand without the glove.
+"""
+import argparse
+import os
+import time
+
+VIEW_SCRIPTS = {
+    'angle': 'AngleFilter Python code for data visualisation.py',
+    'filter': 'Filter Python code for data visualisation.py',
+    'raw': 'Python code for data visualisation.py',
+}
+
+
+def record(args):
+    import threading
+    from Glove_stream import BLOCK, GloveStream, describe_queues, split_gaps
+
+    stream = GloveStream()
+    # Nothing else reads the stream, so holding it up beats losing samples
+    samples = stream.subscribe(maxsize=4096, policy=BLOCK, name='record', gaps=True)
+    stop_event = threading.Event()
+    stamp = stream.clock.wall.strftime("%Y%m%d_%H%M%S")
+    output = args.output or f'adc_data_{stamp}.' + args.format
+
+    writer = None
+    pending_gaps = []
+    started = time.monotonic()
+    last_report = started
+    ble_thread = stream.start_thread(stop_event)
+    try:
+        while ble_thread.is_alive():
+            if args.duration and time.monotonic() - started >= args.duration:
+                break
+            time.sleep(0.1)
+            batch, gaps = split_gaps(samples.drain())
+            pending_gaps += gaps
+            if batch:
+                import numpy as np
+                timestamps = np.array([t for t, _ in batch], dtype=np.int64)
+                values = np.array([v for _, v in batch])
+                if writer is None:
+                    writer = _open_writer(args.format, output, values.shape[1], stream)
+                    print(f"Recording {values.shape[1]} channels to {output}")
+                if args.format == 'glv':
+                    writer.append(stream.clock.offsets(timestamps), values)
+                else:
+                    writer.write_samples(timestamps, values)
+            if writer is not None:
+                for gap in pending_gaps:
+                    writer.mark_gap(*(stream.clock.offsets(gap).tolist() if args.format == 'glv' else gap))
+                pending_gaps = []
+            if time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                dropped_rows = getattr(writer, 'dropped_rows', 0)
+                print(f"{stream.packets} packets, {stream.packets / (last_report - started):.1f}/s",
+                      describe_queues(stream.queue_stats()),
+                      f"{dropped_rows} rows dropped by the writer" if dropped_rows else '')
+    except KeyboardInterrupt:
+        print("Keyboard interrupt received. Exiting...")
+    finally:
+        stop_event.set()
+        ble_thread.join()
+        if writer is not None:
+            if args.format == 'glv':
+                writer.close()
+                print(f"Saved {output}", describe_queues(stream.queue_stats()))
+            else:
+                writer.stop()
+                print(writer.summary(), describe_queues(stream.queue_stats()))
+
+
+def _open_writer(fmt, output, num_channels, stream):
+    names = [f'Channel_{i+1}' for i in range(num_channels)]
+    if fmt == 'glv':
+        from Glove_session import SessionWriter
+        return SessionWriter(output, names, device=stream.name, wall_anchor=stream.clock.wall)
+    from Glove_recorder import CsvRecorder
+    # record() has its own thread, so it can wait for the writer and let the
+    # BLOCK subscription hold samples back instead of dropping rows
+    return CsvRecorder(output, ['Timestamp_ns'] + names, clock=stream.clock, block_timeout=1.0)
+
+
+def view(args):
+    import runpy
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), VIEW_SCRIPTS[args.mode])
+    runpy.run_path(script, run_name='__main__')
+
+
+def calibrate(args):
+    import asyncio
+    from Glove_calibration import glove_calibrate, glove_calibrate_adaptive
+    if args.adaptive:
+        asyncio.run(glove_calibrate_adaptive(args.fingers, args.angles, args.output, max_seconds=args.duration,
+                                             model=args.model))
+    else:
+        asyncio.run(glove_calibrate(args.duration, args.fingers, args.angles, args.output, model=args.model))
+
+
+def analyze(args):
+    import numpy as np
+    from Glove_session import SESSION_SUFFIX, csv_to_session, load_session
+
+    path = args.recording
+    if not path.endswith(SESSION_SUFFIX):
+        session_path = os.path.splitext(path)[0] + SESSION_SUFFIX
+        # Reuse an earlier conversion unless the CSV changed since
+        converted = os.path.isdir(session_path) and os.path.getmtime(session_path) >= os.path.getmtime(path)
+        if converted or args.convert:
+            if not converted:
+                csv_to_session(path, session_path)
+            path = session_path
+        else:
+            import tempfile
+            tmp = tempfile.TemporaryDirectory()
+            path = csv_to_session(path, os.path.join(tmp.name, os.path.basename(session_path)))
+
+    session = load_session(path)
+    seconds = session.seconds()
+    duration = seconds[-1] - seconds[0] if len(session) > 1 else 0.0
+    print(f"{path}: {len(session)} samples over {duration:.1f} s "
+          f"({(len(session) - 1) / duration if duration else 0:.1f} Hz), started {session.wall_anchor}")
+    for start, end in session.gaps:
+        print(f"  gap {start / 1e9:.2f} s - {end / 1e9:.2f} s")
+    channels = np.asarray(session.channels, dtype=np.float64)
+    for i, name in enumerate(session.channel_names):
+        column = channels[:, i]
+        print(f"  {name:>12}: mean {column.mean():12.1f}  std {column.std():10.1f}  "
+              f"min {column.min():12.1f}  max {column.max():12.1f}")
+
+    if args.plot:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(12, 6))
+        for i, name in enumerate(session.channel_names):
+            ax.plot(seconds, channels[:, i], label=name)
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Resistance (Ohm)')
+        ax.legend(loc='upper left')
+        plt.show()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--replay', help="play a recording (or 'synthetic') instead of connecting to the glove")
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed, 0 = as fast as possible')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('record', help='record glove data without plotting')
+    p.add_argument('--duration', type=float, default=0, help='seconds to record, 0 = until Ctrl-C')
+    p.add_argument('--format', choices=['csv', 'glv'], default='csv')
+    p.add_argument('--output', help='file (csv) or directory (glv) to write')
+    p.set_defaults(func=record)
+
+    p = commands.add_parser('view', help='live plots')
+    p.add_argument('--mode', choices=sorted(VIEW_SCRIPTS), default='angle')
+    p.set_defaults(func=view)
+
+    p = commands.add_parser('calibrate', help='calibrate the stretch sensors')
+    p.add_argument('--duration', type=float, default=5,
+                   help='seconds to measure each finger position (the most per angle with --adaptive)')
+    p.add_argument('--adaptive', action='store_true',
+                   help='measure all fingers per angle and stop each step once the readings settle')
+    p.add_argument('--fingers', type=int, nargs='+', default=[1, 2, 3])
+    p.add_argument('--angles', type=float, nargs='+', default=[0, 45, 90, 110])
+    p.add_argument('--model', choices=['monotone', 'poly', 'linear'], default='monotone',
+                   help='curve compiled to <output>_lut.npz next to the straight line fit')
+    p.add_argument('--output', default='Glove_cal.npy')
+    p.set_defaults(func=calibrate)
+
+    p = commands.add_parser('analyze', help='summarise a recording')
+    p.add_argument('recording', help='adc_data_*.csv or .glv session')
+    p.add_argument('--convert', action='store_true', help='keep the converted .glv next to the CSV')
+    p.add_argument('--plot', action='store_true', help='plot every channel')
+    p.set_defaults(func=analyze)
+
+    args = parser.parse_args(argv)
+    if args.replay:
+        os.environ['GLOVE_REPLAY'] = args.replay
+        os.environ['GLOVE_REPLAY_SPEED'] = str(args.speed)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
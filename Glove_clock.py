@@ -0,0 +1,40 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ANCHOR_MARKER = '# anchor'
+
+
+class SessionClock:
+    """
+    Time base of one acquisition session.
+
+    Samples are stamped with time.monotonic_ns(), which can't jump when the
+    system clock is adjusted. The wall-clock time is read once, together
+    with the monotonic origin, and anything that needs a calendar time is
+    derived from that single anchor.
+    """
+
+    def __init__(self):
+        self.origin_ns = time.monotonic_ns()
+        self.wall = datetime.now()
+
+    @staticmethod
+    def now() -> int:
+        return time.monotonic_ns()
+
+    def offsets(self, timestamps_ns):
+        """int64 nanoseconds since the start of the session."""
+        return np.asarray(timestamps_ns, dtype=np.int64) - self.origin_ns
+
+    def seconds(self, timestamps_ns):
+        """float seconds since the start of the session."""
+        return self.offsets(timestamps_ns) / 1e9
+
+    def to_datetime(self, timestamp_ns: int) -> datetime:
+        return self.wall + timedelta(microseconds=(timestamp_ns - self.origin_ns) // 1000)
+
+    def anchor_row(self):
+        """CSV comment row recording the anchor, see Glove_session.csv_to_session."""
+        return [ANCHOR_MARKER, self.wall.isoformat(), self.origin_ns]
@@ -0,0 +1,143 @@
+import json
+import os
+
+import numpy as np
+
+from Glove_session import Session, SessionWriter
+from Glove_stream import split_gaps
+
+# One JSON line per collection in a session directory:
+#   {"start": first row, "session": ..., "finger": ..., "angle": ...}
+# A collection ends where the next one starts (or at the last row).
+SEGMENTS_FILE = 'segments.jsonl'
+
+
+class ChunkedCollector:
+    """
+    Streams collected samples to a .glv session directory instead of a list.
+
+        collector = ChunkedCollector('adc_data.glv', stream.clock)
+        collector.begin(session=0, finger=1, angle=45)
+        collector.append(timestamps_ns, values)   # as batches arrive
+        ...
+        collection = collector.close()            # lazy, memory-mapped handle
+
+    Samples go to disk in chunks of chunk_size rows as they fill, so a
+    crash loses at most one chunk and memory stays at one chunk however
+    long the collection runs. begin() starts a new chunk, so every chunk
+    belongs to exactly one tagged collection.
+    """
+
+    def __init__(self, path: str, clock, chunk_size: int = 1024, device: str = None, calibration=None,
+                 channel_names: list = None):
+        self.path = path
+        self.clock = clock
+        self.chunk_size = chunk_size
+        self.device = device
+        self.calibration = calibration
+        self.channel_names = channel_names
+        self.writer = None
+        self._pending_segments = []  # begun before the first sample told us the channel count
+        self._segment_file = None
+
+    @property
+    def rows(self):
+        """Samples collected so far, written or not."""
+        return 0 if self.writer is None else self.writer.rows
+
+    def _open(self, num_channels):
+        names = self.channel_names or [f'Channel_{i+1}' for i in range(num_channels)]
+        self.writer = SessionWriter(self.path, names, device=self.device, calibration=self.calibration,
+                                    wall_anchor=self.clock.wall, chunk_size=self.chunk_size)
+        self._segment_file = open(os.path.join(self.path, SEGMENTS_FILE), 'w')
+        for segment in self._pending_segments:
+            self._write_segment(segment)
+        self._pending_segments = []
+
+    def _write_segment(self, segment):
+        self._segment_file.write(json.dumps(segment) + '\n')
+        self._segment_file.flush()
+
+    def begin(self, **tags):
+        """Start a new collection, e.g. begin(session=0, finger=1, angle=45)."""
+        segment = {'start': self.rows, **tags}
+        if self.writer is None:
+            self._pending_segments = [s for s in self._pending_segments if s['start'] != segment['start']]
+            self._pending_segments.append(segment)
+        else:
+            self.writer.flush()
+            self._write_segment(segment)
+
+    def append(self, timestamps_ns, values):
+        """Add n monotonic_ns timestamps and an (n, channels) block."""
+        values = np.asarray(values)
+        if len(values) == 0:
+            return
+        if self.writer is None:
+            self._open(values.shape[-1])
+        self.writer.append(self.clock.offsets(timestamps_ns), values)
+
+    def mark_gap(self, start_ns: int, end_ns: int):
+        if self.writer is not None:
+            self.writer.mark_gap(*self.clock.offsets([start_ns, end_ns]).tolist())
+
+    def collect(self, subscription) -> int:
+        """Move everything queued in a GloveStream subscription to disk, returns the number of samples."""
+        batch, gaps = split_gaps(subscription.drain())
+        if batch:
+            self.append(np.array([t for t, _ in batch], dtype=np.int64), np.array([v for _, v in batch]))
+        for gap in gaps:
+            self.mark_gap(gap.start, gap.end)
+        return len(batch)
+
+    def close(self):
+        """Write what is left and return the Collection, or None if nothing was collected."""
+        if self.writer is None:
+            return None
+        self.writer.close()
+        self._segment_file.close()
+        return Collection(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Collection(Session):
+    """
+    A collected session, memory-mapped, with its tagged segments.
+
+    Iterating yields (timestamp_ns, values) like the old lists did but
+    reads from the memory map one row at a time; select() gives the rows
+    of matching segments as arrays.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.segments = []
+        segment_path = os.path.join(path, SEGMENTS_FILE)
+        if os.path.exists(segment_path):
+            with open(segment_path) as file:
+                self.segments = [json.loads(line) for line in file if line.strip()]
+        for segment, following in zip(self.segments, self.segments[1:] + [None]):
+            segment['end'] = len(self) if following is None else following['start']
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield int(self.timestamps[i]), self.channels[i]
+
+    def select(self, **tags):
+        """(timestamps, channels) of every segment whose tags match, e.g. select(finger=1, angle=45)."""
+        rows = [(s['start'], s['end']) for s in self.segments
+                if all(s.get(key) == value for key, value in tags.items())]
+        if len(rows) == 1:
+            start, end = rows[0]
+            return self.timestamps[start:end], self.channels[start:end]  # views, no copy
+        index = np.concatenate([np.arange(start, end) for start, end in rows]) if rows else np.empty(0, dtype=int)
+        return self.timestamps[index], self.channels[index]
+
+
+def load_collection(path: str) -> Collection:
+    return Collection(path)
@@ -0,0 +1,59 @@
+import struct
+import numpy as np
+
+# Packed frame sent by the glove firmware when BINARY_FRAMES is enabled:
+#   bytes 0-1  magic b'GL'
+#   byte  2    channel type, FRAME_FLOAT32 or FRAME_UINT16
+#   byte  3    number of channels N
+#   bytes 4-7  sequence number, uint32
+#   bytes 8-   N channel values
+# Everything is little-endian. An ASCII payload ("123.4,567.8,...") can
+# never start with the magic, so both formats can share the characteristic.
+FRAME_MAGIC = b'GL'
+FRAME_FLOAT32 = 1
+FRAME_UINT16 = 2
+HEADER = struct.Struct('<2sBBI')
+
+_FRAME_DTYPES = {
+    FRAME_FLOAT32: np.dtype('<f4'),
+    FRAME_UINT16: np.dtype('<u2'),
+}
+
+
+def is_binary_frame(data) -> bool:
+    return len(data) >= HEADER.size and data[:2] == FRAME_MAGIC
+
+
+def decode_packet(data):
+    """
+    Decode one BLE notification.
+
+    Returns (seq, values) where values is a 1-D numpy array. Binary frames
+    are decoded without copying and carry their sequence number; ASCII
+    payloads have seq None. Raises ValueError on malformed data.
+    """
+    if is_binary_frame(data):
+        _, kind, n, seq = HEADER.unpack_from(data)
+        dtype = _FRAME_DTYPES.get(kind)
+        if dtype is None:
+            raise ValueError(f"unknown frame type {kind}")
+        if len(data) != HEADER.size + n * dtype.itemsize:
+            raise ValueError(f"frame length {len(data)} does not match {n} channels")
+        return seq, np.frombuffer(data, dtype=dtype, count=n, offset=HEADER.size)
+
+    try:
+        text = bytes(data).decode()
+    except UnicodeDecodeError as e:
+        raise ValueError(str(e)) from None
+    return None, np.array(text.split(','), dtype=np.float64)
+
+
+def encode_frame(values, seq: int = 0, kind: int = FRAME_FLOAT32) -> bytes:
+    """Build a binary frame, the same way the firmware does."""
+    payload = np.asarray(values, dtype=_FRAME_DTYPES[kind])
+    return HEADER.pack(FRAME_MAGIC, kind, len(payload), seq & 0xFFFFFFFF) + payload.tobytes()
+
+
+def encode_ascii(values) -> bytes:
+    """Build an ASCII payload matching the firmware's String(resistance, 1) output."""
+    return ','.join(f"{v:.1f}" for v in values).encode()
@@ -0,0 +1,201 @@
+import math
+
+import numpy as np
+
+# Second-order sections are rows of [b0, b1, b2, a0, a1, a2] with a0 = 1,
+# the same layout scipy.signal uses, designed with the bilinear transform
+# (RBJ audio EQ cookbook) so no scipy is needed.
+
+
+def lowpass_sos(cutoff: float, fs: float, order: int = 2):
+    """Butterworth low-pass as (ceil(order/2), 6) second-order sections."""
+    if not 0 < cutoff < fs / 2:
+        raise ValueError(f"cutoff {cutoff} Hz must be between 0 and fs/2 = {fs / 2} Hz")
+    w0 = 2 * math.pi * cutoff / fs
+    cos_w0 = math.cos(w0)
+    sections = []
+    for k in range(order // 2):
+        # Q of each conjugate pole pair of the analog Butterworth prototype
+        q = 1 / (2 * math.cos((order - 1 - 2 * k) * math.pi / (2 * order)))
+        alpha = math.sin(w0) / (2 * q)
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+        sections.append([*b, *a])
+    if order % 2:
+        # Real pole of odd orders as a first-order section
+        k = math.tan(w0 / 2)
+        sections.append([k, k, 0, 1 + k, k - 1, 0])
+    return _normalise(sections)
+
+
+def notch_sos(freq: float, fs: float, q: float = 30.0):
+    """Notch at freq (e.g. 50 Hz mains pickup) as one second-order section."""
+    if not 0 < freq < fs / 2:
+        raise ValueError(f"notch {freq} Hz must be between 0 and fs/2 = {fs / 2} Hz")
+    w0 = 2 * math.pi * freq / fs
+    alpha = math.sin(w0) / (2 * q)
+    cos_w0 = math.cos(w0)
+    return _normalise([[1, -2 * cos_w0, 1, 1 + alpha, -2 * cos_w0, 1 - alpha]])
+
+
+def _normalise(sections):
+    sos = np.array(sections, dtype=np.float64)
+    sos[:, :3] /= sos[:, 3:4]
+    sos[:, 3:] /= sos[:, 3:4]
+    return sos
+
+
+class SosFilter:
+    """
+    Cascade of second-order sections run on every channel, one block at a time.
+
+    The filter state is kept between calls, so feeding a recording in
+    blocks gives the same result as filtering it in one go. Transposed
+    direct form II. The recursion is linear, so for a block of n samples
+    it is worked out once as matrices (output and next state from input
+    and state) and each block is then two matrix products for all
+    channels instead of a Python loop per sample. The state starts as if
+    the first sample had always been there, so there is no step from zero.
+    """
+
+    MAX_BLOCK = 64  # longer blocks are filtered in chunks, bounding the matrix cache
+
+    def __init__(self, sos, num_channels: int):
+        self.sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+        self.num_channels = num_channels
+        self._state = np.zeros((2 * len(self.sos), num_channels))
+        self._primed = False
+        self._matrices = {}
+
+    def reset(self, value=None):
+        """Clear the state, or settle it on a steady input `value`."""
+        if value is None:
+            self._state[:] = 0
+            self._primed = False
+            return
+        x = np.asarray(value, dtype=np.float64)
+        for s, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            y = x * (b0 + b1 + b2) / (1 + a1 + a2)  # DC gain of the section
+            self._state[2 * s] = y - b0 * x
+            self._state[2 * s + 1] = b2 * x - a2 * y
+            x = y
+        self._primed = True
+
+    def _run(self, block, state):
+        """The plain per-sample recursion on (n, k) inputs, updates state in place."""
+        out = np.array(block, dtype=np.float64)
+        for s, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            z0, z1 = state[2 * s], state[2 * s + 1]
+            for i in range(len(out)):
+                x = out[i]
+                y = b0 * x + z0
+                z0 = b1 * x - a1 * y + z1
+                z1 = b2 * x - a2 * y
+                out[i] = y
+            state[2 * s], state[2 * s + 1] = z0, z1
+        return out
+
+    def _block_matrices(self, n):
+        matrices = self._matrices.get(n)
+        if matrices is None:
+            # Response to each input impulse (first n columns) and to each
+            # unit initial state (last m columns)
+            m = len(self._state)
+            inputs = np.hstack((np.eye(n), np.zeros((n, m))))
+            state = np.hstack((np.zeros((m, n)), np.eye(m)))
+            out = self._run(inputs, state)
+            matrices = self._matrices[n] = (out[:, :n], out[:, n:], state[:, :n], state[:, n:])
+        return matrices
+
+    def process(self, block):
+        """Filter an (n, num_channels) block, returns a new array."""
+        block = np.asarray(block, dtype=np.float64).reshape(-1, self.num_channels)
+        out = np.empty_like(block)
+        if len(block) and not self._primed:
+            self.reset(block[0])
+        for start in range(0, len(block), self.MAX_BLOCK):
+            x = block[start:start + self.MAX_BLOCK]
+            y_x, y_z, z_x, z_z = self._block_matrices(len(x))
+            out[start:start + len(x)] = y_x @ x + y_z @ self._state
+            self._state = z_x @ x + z_z @ self._state
+        return out
+
+
+def butter_lowpass_filter(data, cutoff: float, fs: float, order: int = 2):
+    """Low-pass a whole (n,) or (n, channels) recording along its first axis."""
+    data = np.asarray(data, dtype=np.float64)
+    columns = data.reshape(len(data), -1)
+    return SosFilter(lowpass_sos(cutoff, fs, order), columns.shape[1]).process(columns).reshape(data.shape)
+
+
+def estimate_rate(timestamps_ns):
+    """Sample rate in Hz from the median spacing of monotonic_ns timestamps."""
+    steps = np.diff(np.asarray(timestamps_ns, dtype=np.int64))
+    steps = steps[steps > 0]
+    return 1e9 / float(np.median(steps)) if len(steps) else None
+
+
+class FilterBank:
+    """
+    Streaming low-pass (plus optional notches) designed from the measured sample rate.
+
+        bank = FilterBank(num_channels, lowpass=1.5, notches=[50])
+        filtered = bank.process(timestamps_ns, values)
+
+    With a fixed rate (e.g. after Resampler) the filters are designed
+    straight away. With rate=None the rate is measured from the first
+    `settle` sample intervals; until then samples pass through
+    unfiltered. If the measured rate later drifts by more than `tolerance` the filters are redesigned.
+    Cutoffs above fs/2 are dropped instead of raising, so a slow glove
+    doesn't crash the plot.
+    """
+
+    def __init__(self, num_channels: int, lowpass: float = None, notches=(), order: int = 2,
+                 rate: float = None, settle: int = 16, tolerance: float = 0.2):
+        self.num_channels = num_channels
+        self.lowpass = lowpass
+        self.notches = list(notches)
+        self.order = order
+        self.settle = settle
+        self.tolerance = tolerance
+        self.rate = None
+        self.filter = None
+        self._recent = np.empty(0, dtype=np.int64)
+        self._fixed = rate is not None
+        if self._fixed:
+            self._design(rate)
+
+    def _design(self, rate):
+        self.rate = rate
+        sections = []
+        if self.lowpass is not None and self.lowpass < rate / 2:
+            sections.append(lowpass_sos(self.lowpass, rate, self.order))
+        sections += [notch_sos(f, rate) for f in self.notches if f < rate / 2]
+        previous = self.filter
+        self.filter = SosFilter(np.vstack(sections), self.num_channels) if sections else None
+        if self.filter is not None and previous is not None and previous._primed:
+            # Carry on from the current level rather than restarting from the next sample
+            self.filter.reset(self._last)
+
+    def _measure(self, timestamps_ns):
+        self._recent = np.concatenate((self._recent, timestamps_ns))[-(self.settle + 1):]
+        if len(self._recent) <= self.settle:
+            return
+        rate = estimate_rate(self._recent)
+        if rate and (self.rate is None or abs(rate - self.rate) > self.tolerance * self.rate):
+            self._design(rate)
+
+    def process(self, timestamps_ns, values):
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.num_channels)
+        if len(values) == 0:
+            return values
+        if not self._fixed:
+            self._measure(np.asarray(timestamps_ns, dtype=np.int64))
+        out = values.copy() if self.filter is None else self.filter.process(values)
+        self._last = out[-1]
+        return out
+
+    def reset(self):
+        self._recent = np.empty(0, dtype=np.int64)
+        if self.filter is not None:
+            self.filter.reset()
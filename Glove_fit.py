@@ -0,0 +1,281 @@
+import collections
+
+import numpy as np
+
+from Glove_buffer import RingBuffer
+
+# coef is (n_fingers, 2) of [slope, intercept], the layout of Glove_cal.npy
+LinearFit = collections.namedtuple('LinearFit', ['coef', 'residuals', 'r2'])
+
+# Nonlinear calibrations, compiled to an AngleTable, are saved next to Glove_cal.npy
+LUT_FILE = 'Glove_cal_lut.npz'
+MODELS = ('linear', 'monotone', 'poly')
+
+
+def fit_linear(readings, angles) -> LinearFit:
+    """
+    Least-squares line angle = slope * reading + intercept for every finger at once.
+
+    readings: (n_fingers, n_points) mean sensor values, e.g. Finger_angle.npy
+    angles:   (n_points,) angles shared by all fingers, or (n_fingers, n_points)
+
+    Same result as one sklearn LinearRegression per finger, in closed form.
+    Returns the coefficients, the (n_fingers, n_points) residuals in degrees
+    and R² per finger. A finger whose readings don't change gets slope 0.
+    """
+    x = np.asarray(readings, dtype=np.float64)
+    y = np.broadcast_to(np.asarray(angles, dtype=np.float64), x.shape)
+
+    x_mean = x.mean(axis=1, keepdims=True)
+    y_mean = y.mean(axis=1, keepdims=True)
+    dx = x - x_mean
+    dy = y - y_mean
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+    intercept = y_mean[:, 0] - slope * x_mean[:, 0]
+    coef = np.column_stack((slope, intercept))
+
+    residuals = y - (slope[:, None] * x + intercept[:, None])
+    ss_res = (residuals * residuals).sum(axis=1)
+    ss_tot = (dy * dy).sum(axis=1)
+    r2 = 1.0 - np.divide(ss_res, ss_tot, out=np.ones_like(ss_res), where=ss_tot > 0)
+    return LinearFit(coef, residuals, r2)
+
+
+def _isotonic(y):
+    """Pool adjacent violators: the closest non-decreasing sequence to y (least squares)."""
+    means, counts = [], []
+    for value in y:
+        means.append(float(value))
+        counts.append(1)
+        while len(means) > 1 and means[-2] > means[-1]:
+            mean, count = means.pop(), counts.pop()
+            means[-1] = (means[-1] * counts[-1] + mean * count) / (counts[-1] + count)
+            counts[-1] += count
+    return np.repeat(means, counts)
+
+
+def fit_monotone(readings, angles):
+    """
+    Monotone piecewise-linear curve per finger through the calibration points.
+
+    Takes the same arguments as fit_linear. Angles are made monotone in
+    the reading, rising or falling like the finger's linear fit, so a
+    noisy point can't fold the curve back. Returns one (x, y) pair of
+    knots per finger, x increasing.
+    """
+    x = np.asarray(readings, dtype=np.float64)
+    y = np.broadcast_to(np.asarray(angles, dtype=np.float64), x.shape)
+    direction = np.where(fit_linear(x, y).coef[:, 0] < 0, -1.0, 1.0)
+    knots = []
+    for xi, yi, sign in zip(x, y, direction):
+        order = np.argsort(xi, kind='stable')
+        knots.append((xi[order], sign * _isotonic(sign * yi[order])))
+    return knots
+
+
+def fit_polynomial(readings, angles, degree: int = 3):
+    """One least-squares numpy Polynomial (angle of reading) per finger, degree capped by the number of points."""
+    x = np.asarray(readings, dtype=np.float64)
+    y = np.broadcast_to(np.asarray(angles, dtype=np.float64), x.shape)
+    degree = min(degree, x.shape[1] - 1)
+    return [np.polynomial.Polynomial.fit(xi, yi, degree) for xi, yi in zip(x, y)]
+
+
+def _piecewise(x_knots, y_knots):
+    """Linear interpolation through the knots that carries on along the end segments."""
+    def curve(x):
+        y = np.interp(x, x_knots, y_knots)
+        if len(x_knots) > 1 and x_knots[-1] > x_knots[0]:
+            left = np.polyfit(x_knots[:2], y_knots[:2], 1)[0] if x_knots[1] > x_knots[0] else 0.0
+            right = np.polyfit(x_knots[-2:], y_knots[-2:], 1)[0] if x_knots[-1] > x_knots[-2] else 0.0
+            y = np.where(x < x_knots[0], y_knots[0] + (x - x_knots[0]) * left, y)
+            y = np.where(x > x_knots[-1], y_knots[-1] + (x - x_knots[-1]) * right, y)
+        return y
+    return curve
+
+
+class AngleTable:
+    """
+    Calibration curves compiled into a dense lookup table.
+
+        table = AngleTable.fit(np.load('Finger_angle.npy'), [0, 45, 90, 110], model='monotone')
+        table.save(LUT_FILE)
+        angles = table(readings)   # (n, n_fingers) readings, all fingers in one go
+
+    Each finger's curve is sampled at `size` evenly spaced readings from
+    lo to hi, and the angles are clipped to [lower, upper] when the table
+    is built. Between samples the curve is linear. Each bucket holds its
+    own slope and intercept, so a lookup for every finger at once is a
+    scale-and-shift to a bucket index, two takes and a multiply-add. The
+    cost doesn't depend on the model. It is a bit above the clipped
+    straight line's, up to about 10% for the 32-row blocks in
+    bench_pipeline and about twice as much for 1000-row blocks. Readings
+    outside [lo, hi] get the angle at the nearest end.
+    """
+
+    MAX_BLOCK = 1024  # longer blocks are looked up in chunks of this many rows
+
+    def __init__(self, lo, hi, values, lower: float = 0.0, upper: float = 110.0):
+        self.lo = np.asarray(lo, dtype=np.float64)
+        self.hi = np.asarray(hi, dtype=np.float64)
+        self.values = np.clip(np.asarray(values, dtype=np.float64), lower, upper)
+        self.lower = lower
+        self.upper = upper
+        self.num_fingers, self.size = self.values.shape
+
+        # Per finger: bucket 0 below lo, buckets 1..size-1 between samples, bucket size above hi
+        grid = np.linspace(self.lo, self.hi, self.size, axis=-1)
+        rise = np.diff(self.values, axis=1)
+        run = np.diff(grid, axis=1)
+        slope = np.zeros((self.num_fingers, self.size + 1))
+        intercept = np.empty((self.num_fingers, self.size + 1))
+        slope[:, 1:-1] = np.divide(rise, run, out=np.zeros_like(rise), where=run > 0)
+        intercept[:, 1:-1] = self.values[:, :-1] - slope[:, 1:-1] * grid[:, :-1]
+        intercept[:, 0] = self.values[:, 0]
+        intercept[:, -1] = self.values[:, -1]
+        self._slope = slope.ravel()
+        self._intercept = intercept.ravel()
+
+        row = np.arange(self.num_fingers) * (self.size + 1.0)
+        span = np.where(self.hi > self.lo, self.hi - self.lo, 1.0)
+        self._scale = (self.size - 1) / span
+        self._offset = row + 1.0 - self.lo * self._scale
+        first = row
+        last = row + self.size
+        # Parameters repeated for MAX_BLOCK rows, so every operation in __call__
+        # runs on flat, equal-length arrays instead of broadcasting short rows
+        self._tiles = [np.tile(p, self.MAX_BLOCK) for p in (self._scale, self._offset, first, last)]
+
+    @classmethod
+    def from_curves(cls, curves, lo, hi, size: int = 4096, lower: float = 0.0, upper: float = 110.0):
+        """Sample one callable (readings -> angles) per finger onto the grid."""
+        grid = np.linspace(lo, hi, size, axis=-1)
+        values = np.array([curve(g) for curve, g in zip(curves, grid)])
+        return cls(lo, hi, values, lower, upper)
+
+    @classmethod
+    def fit(cls, readings, angles, model: str = 'monotone', degree: int = 3, size: int = 4096,
+            margin: float = 0.5, lower: float = 0.0, upper: float = 110.0):
+        """
+        Fit `model` ('linear', 'monotone' or 'poly') to calibration points and compile it.
+
+        readings and angles are as for fit_linear. The table covers the
+        calibrated readings plus `margin` times their range on each side.
+        Beyond the calibrated points, the monotone model carries on along
+        its end segments.
+        """
+        x = np.asarray(readings, dtype=np.float64)
+        if model == 'linear':
+            coef = fit_linear(x, angles).coef
+            curves = [np.polynomial.Polynomial([intercept, slope]) for slope, intercept in coef]
+        elif model == 'monotone':
+            curves = [_piecewise(xk, yk) for xk, yk in fit_monotone(x, angles)]
+        elif model == 'poly':
+            curves = fit_polynomial(x, angles, degree)
+        else:
+            raise ValueError(f"unknown calibration model {model!r}, expected one of {MODELS}")
+        span = x.max(axis=1) - x.min(axis=1)
+        return cls.from_curves(curves, x.min(axis=1) - margin * span, x.max(axis=1) + margin * span,
+                               size, lower, upper)
+
+    def clipped(self, lower: float, upper: float) -> 'AngleTable':
+        """The same table limited to [lower, upper], or self if it already is."""
+        if lower <= self.lower and upper >= self.upper:
+            return self
+        return AngleTable(self.lo, self.hi, self.values, max(lower, self.lower), min(upper, self.upper))
+
+    def __call__(self, readings):
+        """(n, n_fingers) angles for (n, n_fingers) readings."""
+        readings = np.asarray(readings, dtype=np.float64)
+        n = len(readings)
+        if n > self.MAX_BLOCK:
+            angles = np.empty(readings.shape)
+            for start in range(0, n, self.MAX_BLOCK):
+                angles[start:start + self.MAX_BLOCK] = self(readings[start:start + self.MAX_BLOCK])
+            return angles
+        scale, offset, first, last = (tile[:n * self.num_fingers] for tile in self._tiles)
+        x = readings.reshape(-1)
+        position = x * scale
+        position += offset
+        np.minimum(position, last, out=position)  # cheaper per call than np.clip
+        np.maximum(position, first, out=position)
+        index = position.astype(np.intp)
+        angles = self._slope.take(index, mode='clip')  # mode='clip' so a NaN reading can't index out of bounds
+        angles *= x
+        angles += self._intercept.take(index, mode='clip')
+        return angles.reshape(n, self.num_fingers)
+
+    def __len__(self):
+        return self.num_fingers
+
+    def save(self, path: str = LUT_FILE):
+        np.savez(path, lo=self.lo, hi=self.hi, values=self.values, limits=[self.lower, self.upper])
+
+    @classmethod
+    def load(cls, path: str = LUT_FILE) -> 'AngleTable':
+        with np.load(path) as data:
+            lower, upper = data['limits']
+            return cls(data['lo'], data['hi'], data['values'], float(lower), float(upper))
+
+
+def load_calibration(path: str):
+    """An AngleTable from a .npz, otherwise the linear [slope, intercept] array of a .npy."""
+    if path.endswith('.npz'):
+        return AngleTable.load(path)
+    return np.load(path)
+
+
+class AngleMapper:
+    """
+    Calibrated finger angles, computed once per sample as blocks arrive.
+
+        mapper = AngleMapper(np.load('Glove_cal.npy'), buffer_size=1000)
+        mapper.process(filtered_block)   # maps all fingers in one go
+        mapper.view()[:, finger]         # angles to plot, no copying
+
+    coef is (n_fingers, 2) of [slope, intercept] or a nonlinear AngleTable,
+    and channels the sensor column of each finger (default the first
+    n_fingers). Angles are clipped to [lower, upper] degrees and kept in a
+    RingBuffer, so a redraw only reads them.
+    """
+
+    def __init__(self, coef, channels=None, lower: float = 0.0, upper: float = 110.0, buffer_size: int = 1000):
+        if isinstance(coef, AngleTable):
+            self.table = coef.clipped(lower, upper)  # clipping is baked into the table
+            self.num_fingers = self.table.num_fingers
+        else:
+            self.table = None
+            coef = np.asarray(coef, dtype=np.float64)
+            self.slope = coef[:, 0]
+            self.intercept = coef[:, 1]
+            self.num_fingers = len(coef)
+        self.channels = np.arange(self.num_fingers) if channels is None else np.asarray(channels)
+        self.lower = lower
+        self.upper = upper
+        self.buffer = RingBuffer(buffer_size, self.num_fingers)
+
+    def map(self, block):
+        """(n, n_fingers) angles for an (n, num_channels) block, not stored."""
+        if self.table is not None:
+            return self.table(np.asarray(block)[:, self.channels])
+        angles = np.asarray(block, dtype=np.float64)[:, self.channels] * self.slope
+        angles += self.intercept
+        return np.clip(angles, self.lower, self.upper, out=angles)
+
+    def process(self, block):
+        """Map a block, append it to the buffer and return the new angles."""
+        angles = self.map(block)
+        self.buffer.extend(angles)
+        return angles
+
+    def view(self):
+        return self.buffer.view()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def clear(self):
+        self.buffer.clear()
@@ -0,0 +1,167 @@
+import json
+import math
+import threading
+import time
+
+import numpy as np
+
+SUB_BUCKETS = 4  # buckets per doubling, so percentiles are within ~12%
+N_BUCKETS = 64 * SUB_BUCKETS
+
+
+class Histogram:
+    """
+    Fixed-size log-scale histogram of durations in nanoseconds.
+
+    Recording is O(1) and memory never grows, so it can run for a whole
+    session. Percentiles are reported as the upper edge of their bucket.
+    Thread-safe: the BLE callback records while the plot loop reads.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(N_BUCKETS, dtype=np.int64)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index(value):
+        mantissa, exponent = math.frexp(value)
+        return max(0, min(N_BUCKETS - 1, exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)))
+
+    def record(self, value_ns: int):
+        index = self._index(value_ns)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ns
+            if value_ns > self.max:
+                self.max = value_ns
+
+    def record_many(self, values_ns):
+        values_ns = np.asarray(values_ns, dtype=np.float64)
+        if values_ns.size == 0:
+            return
+        mantissa, exponent = np.frexp(values_ns)
+        index = exponent * SUB_BUCKETS + ((mantissa - 0.5) * 2 * SUB_BUCKETS).astype(np.int64)
+        index = np.clip(index, 0, N_BUCKETS - 1)
+        total, largest = int(values_ns.sum()), int(values_ns.max())
+        with self._lock:
+            np.add.at(self.counts, index, 1)
+            self.count += values_ns.size
+            self.total += total
+            self.max = max(self.max, largest)
+
+    def snapshot(self, reset: bool = False):
+        """Consistent copy of (counts, count, total, max), optionally resetting in the same step."""
+        with self._lock:
+            snapshot = self.counts.copy(), self.count, self.total, self.max
+            if reset:
+                self._reset()
+        return snapshot
+
+    @staticmethod
+    def _percentile(counts, count, q):
+        if count == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(counts), math.ceil(q / 100 * count)))
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return (0.5 + (sub + 1) / (2 * SUB_BUCKETS)) * 2.0 ** exponent
+
+    def percentile(self, q: float) -> float:
+        """Approximate q-th percentile in nanoseconds (0 if empty)."""
+        counts, count, _, _ = self.snapshot()
+        return self._percentile(counts, count, q)
+
+    def summary(self, reset: bool = False):
+        """p50/p99/max/mean in milliseconds, all from the same moment."""
+        counts, count, total, largest = self.snapshot(reset)
+        return {
+            'count': count,
+            'p50_ms': self._percentile(counts, count, 50) / 1e6,
+            'p99_ms': self._percentile(counts, count, 99) / 1e6,
+            'max_ms': largest / 1e6,
+            'mean_ms': total / count / 1e6 if count else 0.0,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.counts[:] = 0
+        self.count = self.total = self.max = 0
+
+
+class Metrics:
+    """
+    Per-stage latency histograms for the acquisition and plotting loop.
+
+        t = metrics.start()
+        ...filter...
+        metrics.stop('filter', t)
+
+    When disabled, start() returns 0 and stop() returns straight away, so
+    the hooks can stay in the hot path. Queue residency (BLE arrival to
+    the plot loop picking the sample up) is recorded from the samples'
+    monotonic_ns timestamps. With a log file, summaries (and whatever is
+    in `counters`) are appended as JSON lines every dump_interval seconds.
+    Stages can be recorded from any thread (the BLE callback does).
+    """
+
+    def __init__(self, enabled: bool = True, log_file: str = None, dump_interval: float = 10.0):
+        self.enabled = enabled
+        self.log_file = log_file
+        self.dump_interval = dump_interval
+        self.stages = {}
+        self.counters = {}  # e.g. stream.queue_stats(), logged along with the stages
+        self._last_dump = time.monotonic()
+        self._lock = threading.Lock()  # guards adding stages, the histograms lock themselves
+
+    def _histogram(self, name):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(name, Histogram())
+        return histogram
+
+    def start(self) -> int:
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def stop(self, name: str, started: int):
+        if self.enabled:
+            self._histogram(name).record(time.perf_counter_ns() - started)
+
+    def record_residency(self, timestamps_ns, name: str = 'queue_residency'):
+        """Time each sample spent between arrival and now."""
+        if self.enabled and len(timestamps_ns):
+            self._histogram(name).record_many(time.monotonic_ns() - np.asarray(timestamps_ns, dtype=np.int64))
+
+    def summary(self, reset: bool = False):
+        with self._lock:
+            stages = list(self.stages.items())
+        return {name: histogram.summary(reset) for name, histogram in stages}
+
+    def overlay_text(self):
+        """One line per stage, for drawing on top of a plot."""
+        return '\n'.join(f"{name}: p50 {s['p50_ms']:.2f} ms  p99 {s['p99_ms']:.2f} ms"
+                         for name, s in self.summary().items())
+
+    def maybe_dump(self, reset: bool = True):
+        """Append a summary to the log file if dump_interval has passed. Returns True if it did."""
+        if not self.enabled or self.log_file is None:
+            return False
+        now = time.monotonic()
+        if now - self._last_dump < self.dump_interval:
+            return False
+        self._last_dump = now
+        # Summarise and reset in one step, so nothing recorded in between is lost
+        record = {'time': time.time(), 'stages': self.summary(reset), 'counters': self.counters}
+        with open(self.log_file, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+        return True
+
+
+# Shared do-nothing instance for code paths without instrumentation
+DISABLED = Metrics(enabled=False)
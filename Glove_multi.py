@@ -0,0 +1,211 @@
+"""
+Several gloves at once, e.g. both hands or two subjects.
+
+    python Glove_multi.py --gloves 2
+    python Glove_multi.py --address AA:BB:CC:DD:EE:01 AA:BB:CC:DD:EE:02 --labels left right
+    GLOVE_REPLAY=synthetic python Glove_multi.py --gloves 3 --duration 10
+
+All gloves run in one asyncio loop on one thread and share a SessionClock,
+so their timestamps line up. Each glove gets its own calibration
+(Glove_cal_<label>[_lut].npz/.npy if there is one, else the shared one), plot buffers
+and .glv recording.
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+
+from Glove_buffer import RingBuffer
+from Glove_clock import SessionClock
+from Glove_fit import AngleMapper, AngleTable, load_calibration
+from Glove_session import SESSION_SUFFIX, SessionWriter
+from Glove_stream import GloveStream, split_gaps
+
+
+def calibration_file(label: str, default: str = 'Glove_cal.npy'):
+    """
+    The glove's own calibration if it has one, otherwise the shared one (or
+    None). A compiled lookup table (<name>_lut.npz) wins over the line.
+    """
+    shared = os.path.splitext(default)[0]
+    for name in (f'{shared}_{label}', shared):
+        for path in (name + '_lut.npz', name + '.npy'):
+            if os.path.exists(path):
+                return path
+    return None
+
+
+class GloveUnit:
+    """
+    Per-glove state: its subscription, angle mapping, buffers and recording.
+
+    poll() drains whatever the glove sent since the last call, so one loop
+    can serve every glove without a thread or queue of its own.
+    """
+
+    def __init__(self, stream: GloveStream, label: str, calibration=None, buffer_size: int = 1000,
+                 record_path: str = None):
+        self.stream = stream
+        self.label = label
+        self.samples = stream.subscribe(maxsize=4096, name=label, gaps=True)
+        if calibration is not None and not isinstance(calibration, AngleTable):
+            calibration = np.asarray(calibration, dtype=np.float64)
+        self.calibration = calibration
+        self.buffer_size = buffer_size
+        self.record_path = record_path
+        self.time_buffer = None
+        self.raw_buffer = None
+        self.angles = None
+        self.writer = None
+        self.samples_seen = 0
+
+    def _setup(self, num_channels):
+        self.time_buffer = RingBuffer(self.buffer_size, 1, dtype=np.int64)
+        self.raw_buffer = RingBuffer(self.buffer_size, num_channels)
+        if self.calibration is not None:
+            self.angles = AngleMapper(self.calibration, buffer_size=self.buffer_size)
+        if self.record_path is not None:
+            linear = None if isinstance(self.calibration, AngleTable) else self.calibration
+            self.writer = SessionWriter(self.record_path, [f'Channel_{i+1}' for i in range(num_channels)],
+                                        device=self.stream.name, calibration=linear,
+                                        wall_anchor=self.stream.clock.wall)
+
+    def poll(self) -> int:
+        """Process the samples that arrived since the last poll, returns how many."""
+        batch, gaps = split_gaps(self.samples.drain())
+        if batch:
+            if self.raw_buffer is None:
+                self._setup(len(batch[0][1]))
+            batch = [(t, v) for t, v in batch if len(v) == self.raw_buffer.num_channels]
+            timestamps = np.array([t for t, _ in batch], dtype=np.int64)
+            values = np.array([v for _, v in batch])
+            self.time_buffer.extend(timestamps)
+            self.raw_buffer.extend(values)
+            if self.angles is not None:
+                self.angles.process(values)
+            if self.writer is not None:
+                self.writer.append(self.stream.clock.offsets(timestamps), values)
+            self.samples_seen += len(batch)
+        if self.writer is not None:
+            for gap in gaps:
+                self.writer.mark_gap(*self.stream.clock.offsets(gap).tolist())
+        return len(batch)
+
+    def close(self):
+        self.poll()
+        if self.writer is not None:
+            self.writer.close()
+
+
+class GloveGroup:
+    """
+    N gloves in one event loop with one shared time base.
+
+        group = GloveGroup(count=2)                   # the first two gloves found
+        group = GloveGroup(addresses=[left, right])   # or exactly these
+        ble_thread = group.start_thread(stop_event)
+        while ...:
+            group.poll()
+            group.units[0].angles.view()
+
+    Each GloveStream keeps reconnecting on its own; streams without a
+    fixed address share a set of claimed addresses so no two pick the
+    same glove.
+    """
+
+    def __init__(self, count: int = None, addresses=None, labels=None, record_dir: str = None,
+                 buffer_size: int = 1000, clock: SessionClock = None, **stream_options):
+        if addresses:
+            count = len(addresses)
+        elif not count:
+            raise ValueError("give the number of gloves or their addresses")
+        labels = list(labels) if labels else [str(i) for i in range(count)]
+        if len(labels) != count:
+            raise ValueError(f"{count} gloves but {len(labels)} labels")
+        self.clock = clock if clock is not None else SessionClock()
+        self.claimed = set()
+        stamp = self.clock.wall.strftime("%Y%m%d_%H%M%S")
+        self.units = []
+        for i, label in enumerate(labels):
+            stream = GloveStream(clock=self.clock, claimed=self.claimed,
+                                 address=addresses[i] if addresses else None, **stream_options)
+            cal_file = calibration_file(label)
+            record_path = None
+            if record_dir is not None:
+                record_path = os.path.join(record_dir, f'adc_data_{stamp}_{label}{SESSION_SUFFIX}')
+            self.units.append(GloveUnit(stream, label, load_calibration(cal_file) if cal_file else None,
+                                        buffer_size, record_path))
+        self.started = None
+
+    @property
+    def streams(self):
+        return [unit.stream for unit in self.units]
+
+    async def run(self, stop_event: threading.Event, reconnect: bool = True):
+        self.started = time.monotonic()
+        await asyncio.gather(*(stream.run(stop_event, reconnect) for stream in self.streams))
+
+    def start_thread(self, stop_event: threading.Event) -> threading.Thread:
+        """All gloves in one thread and event loop."""
+        thread = threading.Thread(target=lambda: asyncio.run(self.run(stop_event)), daemon=True)
+        thread.start()
+        return thread
+
+    def poll(self) -> int:
+        return sum(unit.poll() for unit in self.units)
+
+    def close(self):
+        for unit in self.units:
+            unit.close()
+
+    def stats(self):
+        """Packets and packets/sec per glove and for the whole group."""
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        per_glove = {unit.label: {'device': unit.stream.address, 'packets': unit.stream.packets,
+                                  'rate': unit.stream.packets / elapsed if elapsed else 0.0,
+                                  'reconnects': unit.stream.reconnects, 'queue': unit.samples.stats()}
+                     for unit in self.units}
+        packets = sum(unit.stream.packets for unit in self.units)
+        dropped = sum(unit.samples.dropped for unit in self.units)
+        return {'gloves': per_glove, 'packets': packets, 'rate': packets / elapsed if elapsed else 0.0,
+                'dropped': dropped}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--gloves', type=int, default=2, help='connect to this many gloves')
+    parser.add_argument('--address', nargs='+', help='connect to exactly these gloves')
+    parser.add_argument('--labels', nargs='+', help='one name per glove, used for calibration and file names')
+    parser.add_argument('--output', default='.', help='directory for the .glv recordings')
+    parser.add_argument('--duration', type=float, default=0, help='seconds to record, 0 = until Ctrl-C')
+    args = parser.parse_args(argv)
+
+    group = GloveGroup(count=args.gloves, addresses=args.address, labels=args.labels, record_dir=args.output)
+    stop_event = threading.Event()
+    ble_thread = group.start_thread(stop_event)
+    started = last_report = time.monotonic()
+    try:
+        while ble_thread.is_alive():
+            if args.duration and time.monotonic() - started >= args.duration:
+                break
+            group.poll()
+            if time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                stats = group.stats()
+                gloves = ', '.join(f"{label} {g['rate']:.1f}/s" for label, g in stats['gloves'].items())
+                print(f"{stats['packets']} packets, {stats['rate']:.1f}/s ({gloves}), {stats['dropped']} dropped")
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        print("Keyboard interrupt received. Exiting...")
+    finally:
+        stop_event.set()
+        ble_thread.join()
+        group.close()
+        print(group.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import collections
+import csv
+import queue
+import threading
+import time
+
+import numpy as np
+
+GAP_MARKER = '# gap'
+TOUCH_MARKER = '# touch'
+
+
+class CsvRecorder:
+    """
+    Writes rows to one CSV file from a background thread.
+
+    The file is opened once, rows are handed over through a bounded queue
+    and written out in blocks, either when `flush_size` rows are pending or
+    `flush_interval` seconds have passed. The plot loop only ever pays for
+    a queue put. Rows that don't fit in the queue are counted in
+    `dropped_rows`, see summary(); with block_timeout, write_rows() first
+    waits that long for room, for callers that may be held up. Gap and
+    touch marker rows bypass the queue and are never dropped; they can
+    land a little ahead of samples still queued, each row has its time.
+
+    With a SessionClock, the session anchor is written as a '# anchor'
+    row under the header, and write_samples()/mark_gap() take monotonic_ns
+    timestamps and store them as nanoseconds since that anchor.
+    """
+
+    def __init__(self, filename: str, header: list, flush_interval: float = 0.5,
+                 flush_size: int = 256, max_queue: int = 1024, stop_event: threading.Event = None,
+                 clock=None, block_timeout: float = None):
+        self.filename = filename
+        self.block_timeout = block_timeout
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.clock = clock
+        self.rows_written = 0
+        self.dropped_rows = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)  # holds lists of rows
+        self._markers = collections.deque()  # marker rows, unbounded: few, and losing one joins across a gap
+        self._stop_event = stop_event if stop_event is not None else threading.Event()
+        self._closed = False
+
+        self._file = open(filename, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+        if clock is not None:
+            self._writer.writerow(clock.anchor_row())
+        self._file.flush()
+
+        self._thread = threading.Thread(target=self._run, name="CsvRecorder", daemon=True)
+        self._thread.start()
+
+    def write(self, row):
+        """Queue a single row."""
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        """Queue a block of rows, counted as dropped if the queue stays full (see block_timeout)."""
+        if self._closed or not rows:
+            return
+        try:
+            if self.block_timeout is None:
+                self._queue.put_nowait(list(rows))
+            else:
+                self._queue.put(list(rows), timeout=self.block_timeout)
+        except queue.Full:
+            self.dropped_rows += len(rows)
+
+    def write_samples(self, timestamps_ns, values):
+        """Queue n samples: timestamps (monotonic_ns with a clock, else as given) and an (n, channels) block."""
+        if self.clock is not None:
+            offsets = self.clock.offsets(timestamps_ns).tolist()
+        else:
+            offsets = np.asarray(timestamps_ns).tolist()
+        values = np.asarray(values).tolist()
+        self.write_rows([[t] + v for t, v in zip(offsets, values)])
+
+    def mark_gap(self, start, end):
+        """
+        Record an interval without data as a '# gap,start,end' row.
+
+        The leading '#' lets pd.read_csv(..., comment='#') skip it, and
+        Glove_session turns it back into a gap.
+        """
+        if self.clock is not None:
+            start, end = int(start - self.clock.origin_ns), int(end - self.clock.origin_ns)
+        self._write_marker([GAP_MARKER, start, end])
+
+    def mark_touch(self, timestamp, channel, pressed):
+        """Record a pressure pad press (1) or release (0) as a '# touch,time,channel,pressed' row."""
+        if self.clock is not None:
+            timestamp = int(timestamp - self.clock.origin_ns)
+        self._write_marker([TOUCH_MARKER, timestamp, channel, int(pressed)])
+
+    def _write_marker(self, row):
+        if not self._closed:
+            self._markers.append(row)
+
+    def _take_markers(self):
+        rows = []
+        while self._markers:
+            rows.append(self._markers.popleft())
+        return rows
+
+    def _run(self):
+        pending = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                pending.extend(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            pending.extend(self._take_markers())
+
+            stopping = self._stop_event.is_set() and self._queue.empty() and not self._markers
+            if pending and (stopping or len(pending) >= self.flush_size
+                            or time.monotonic() - last_flush >= self.flush_interval):
+                self._writer.writerows(pending)
+                self._file.flush()
+                self.rows_written += len(pending)
+                pending = []
+                last_flush = time.monotonic()
+            if stopping:
+                break
+
+    def stop(self):
+        """Write out everything still queued and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_event.set()
+        self._thread.join()
+        # Anything queued after the writer thread saw the stop signal
+        while not self._queue.empty():
+            rows = self._queue.get_nowait()
+            self._writer.writerows(rows)
+            self.rows_written += len(rows)
+        rows = self._take_markers()
+        self._writer.writerows(rows)
+        self.rows_written += len(rows)
+        self._file.close()
+
+    def summary(self) -> str:
+        text = f"{self.rows_written} rows written to {self.filename}"
+        if self.dropped_rows:
+            text += f", {self.dropped_rows} rows dropped because the writer couldn't keep up"
+        return text
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
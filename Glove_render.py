@@ -0,0 +1,104 @@
+import numpy as np
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
+
+
+class BlitRenderer:
+    """
+    Redraws one figure by blitting only its moving artists.
+
+    The static parts (axes, ticks, labels, legend) are drawn once and cached
+    as a background image. Each update() restores that image, draws the
+    registered Line2D/bar artists on top and blits the result. Frames with
+    no new data are skipped, and axes are only rescaled (one full redraw)
+    when the data leaves the current limits. Limits get `headroom` extra
+    space so a scrolling time axis doesn't force a redraw every frame.
+
+    Falls back to full canvas.draw() redraws when blit=False or the
+    backend can't blit.
+    """
+
+    def __init__(self, fig, blit: bool = True, headroom: float = 0.1):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.blit = blit and getattr(self.canvas, 'supports_blit', False)
+        self.headroom = headroom
+        self._artists = {}  # ax -> list of artists
+        self._background = None
+        self._needs_full_draw = True
+        self.full_draws = 0
+        self.blits = 0
+        self._cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add(self, ax, artists):
+        """Register the artists on `ax` that change from frame to frame."""
+        artists = list(artists)
+        for artist in artists:
+            artist.set_animated(self.blit)
+        self._artists.setdefault(ax, []).extend(artists)
+        self._needs_full_draw = True
+
+    def _on_draw(self, event):
+        # Any full draw (first frame, window resize, rescale) refreshes the cached background
+        if self.blit and self._artists:
+            self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+            self._draw_artists()
+
+    def _draw_artists(self):
+        for ax, artists in self._artists.items():
+            for artist in artists:
+                ax.draw_artist(artist)
+
+    def _rescale(self):
+        """Rescale every axis whose artists left its limits. Returns True if any did."""
+        rescaled = False
+        for ax, artists in self._artists.items():
+            extents = [e for e in (_data_extent(a) for a in artists) if e is not None]
+            if not extents:
+                continue
+            extents = np.array(extents)
+            x0, y0 = extents[:, 0].min(), extents[:, 1].min()
+            x1, y1 = extents[:, 2].max(), extents[:, 3].max()
+            xlim, ylim = ax.get_xlim(), ax.get_ylim()
+            if x0 >= xlim[0] and x1 <= xlim[1] and y0 >= ylim[0] and y1 <= ylim[1]:
+                continue
+            ax.relim()
+            ax.autoscale_view()
+            # Time only grows, so x gets headroom on the right only
+            (xlo, xhi), (ylo, yhi) = ax.get_xlim(), ax.get_ylim()
+            ax.set_xlim(xlo, xhi + (xhi - xlo) * self.headroom)
+            ax.set_ylim(ylo - (yhi - ylo) * self.headroom, yhi + (yhi - ylo) * self.headroom)
+            rescaled = True
+        return rescaled
+
+    def update(self, changed: bool = True):
+        """Render a frame if anything changed, and keep the GUI responsive either way."""
+        if changed and self._artists:
+            if self._rescale() or self._needs_full_draw or self._background is None or not self.blit:
+                self._needs_full_draw = False
+                self.full_draws += 1
+                self.canvas.draw()
+            else:
+                self.canvas.restore_region(self._background)
+                self._draw_artists()
+                self.canvas.blit(self.fig.bbox)
+                self.blits += 1
+        self.canvas.flush_events()
+
+    def close(self):
+        self.canvas.mpl_disconnect(self._cid)
+
+
+def _data_extent(artist):
+    """(xmin, ymin, xmax, ymax) of an artist's data, or None if it has none."""
+    if isinstance(artist, Line2D):
+        x, y = np.asarray(artist.get_xdata(), float), np.asarray(artist.get_ydata(), float)
+        if x.size == 0 or np.isnan(x).all() or np.isnan(y).all():
+            return None
+        return np.nanmin(x), np.nanmin(y), np.nanmax(x), np.nanmax(y)
+    if isinstance(artist, Rectangle):
+        x, y = artist.get_x(), artist.get_y()
+        x2, y2 = x + artist.get_width(), y + artist.get_height()
+        return min(x, x2), min(y, y2), max(x, x2), max(y, y2)
+    return None
+
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from Glove_decoder import encode_ascii, encode_frame
+from Glove_session import SESSION_SUFFIX, csv_to_session, load_session
+
+# Point any entry point at a recording instead of the glove, e.g.
+#   GLOVE_REPLAY=adc_data_20250623_130130.csv GLOVE_REPLAY_SPEED=0 python Glove_calibration.py
+# GLOVE_REPLAY=synthetic generates data instead. Speed 1 is real time,
+# N is N times faster and 0 is as fast as possible.
+REPLAY_ENV = 'GLOVE_REPLAY'
+REPLAY_SPEED_ENV = 'GLOVE_REPLAY_SPEED'
+
+
+def session_source(path: str):
+    """(offset_ns, values) from a .glv session or an adc_data_*.csv recording."""
+    tmp = None
+    if not path.endswith(SESSION_SUFFIX):
+        tmp = tempfile.TemporaryDirectory()
+        path = csv_to_session(path, os.path.join(tmp.name, 'replay' + SESSION_SUFFIX))
+    session = load_session(path)
+    try:
+        start = int(session.timestamps[0]) if len(session) else 0
+        for t, values in zip(session.timestamps, session.channels):
+            yield int(t) - start, values
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+
+def synthetic_source(num_channels: int = 6, rate: float = 20.0, duration: float = None, seed: int = 0):
+    """
+    Made-up glove data at a fixed rate. The first half of the channels look
+    like stretch sensors, the rest like pressure pads that toggle between
+    open circuit (-1) and a resistance. Runs forever if duration is None.
+    """
+    rng = np.random.default_rng(seed)
+    n_stretch = (num_channels + 1) // 2
+    phase = rng.uniform(0, 2 * np.pi, num_channels)
+    k = 0
+    while duration is None or k / rate < duration:
+        t = k / rate
+        values = np.empty(num_channels)
+        values[:n_stretch] = 175000 + 20000 * np.sin(2 * np.pi * 0.5 * t + phase[:n_stretch])
+        pressed = np.sin(2 * np.pi * 0.2 * t + phase[n_stretch:]) > 0
+        values[n_stretch:] = np.where(pressed, 3000 + 500 * np.sin(t), -1)
+        values += rng.normal(0, 200, num_channels)
+        yield int(k * 1e9 / rate), values
+        k += 1
+
+
+class ReplayClient:
+    """
+    Stands in for BleakClient and sends a recording as notifications.
+
+    The payloads are encoded like the firmware does (ASCII, or binary
+    frames with binary=True), so they go through the normal notification
+    handler and decoder. speed=1 replays in real time, speed=N N times
+    faster and speed=0 as fast as the event loop allows. When the source
+    runs out the client stays connected and sets `finished`.
+    """
+
+    def __init__(self, source, speed: float = 1.0, binary: bool = False,
+                 name: str = "Jeppe is 2 cool (replay)", disconnected_callback=None):
+        self.source = source
+        self.speed = speed
+        self.binary = binary
+        self.name = name
+        self.address = 'replay'
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self.finished = False
+        self.packets_sent = 0
+        self.elapsed = 0.0
+        self._task = None
+
+    @classmethod
+    def from_env(cls):
+        """ReplayClient configured by GLOVE_REPLAY / GLOVE_REPLAY_SPEED, or None."""
+        target = os.environ.get(REPLAY_ENV)
+        if not target:
+            return None
+        speed = float(os.environ.get(REPLAY_SPEED_ENV, '1'))
+        source = synthetic_source() if target == 'synthetic' else session_source(target)
+        return cls(source, speed=speed)
+
+    @property
+    def throughput(self):
+        """Packets per second sent so far."""
+        return self.packets_sent / self.elapsed if self.elapsed else 0.0
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def disconnect(self):
+        await self.stop_notify(None)
+        self.is_connected = False
+
+    async def start_notify(self, characteristic, callback):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._feed(characteristic, callback))
+
+    async def stop_notify(self, characteristic):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _feed(self, characteristic, callback):
+        start = time.perf_counter()
+        for seq, (offset_ns, values) in enumerate(self.source):
+            if self.speed:
+                delay = offset_ns / 1e9 / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif seq % 64 == 0:
+                await asyncio.sleep(0)  # let the consumers run
+            payload = encode_frame(values, seq) if self.binary else encode_ascii(values)
+            callback(characteristic, bytearray(payload))
+            self.packets_sent += 1
+            self.elapsed = time.perf_counter() - start
+        self.finished = True
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
@@ -0,0 +1,163 @@
+import math
+import numpy as np
+
+from Glove_filter import SosFilter, lowpass_sos
+
+
+class Resampler:
+    """
+    Turns irregularly timed samples into a uniform stream at `rate` Hz.
+
+    Every input sample is used. They first go through a Butterworth
+    low-pass of `order` at `cutoff` Hz (Glove_filter), designed for the
+    input rate. The default cutoff is a quarter of the output rate, so at
+    order 4 the output Nyquist frequency is down about 24 dB and
+    everything above it more, instead of being aliased. The filtered
+    signal is then linearly interpolated at the output ticks. Whole
+    blocks are processed at once for all channels.
+
+    The input rate is the mean spacing over each run of `settle` input
+    intervals counted from the start (or a restart). Blocks are split
+    where a run ends, so the filter is designed and redesigned at the
+    same samples however the input is cut into process() calls. Until
+    the first run is complete, samples are held back rather than passed
+    on unfiltered. When a later run's rate differs by more than
+    `tolerance`, the filter is redesigned. An input too slow to carry
+    anything above the cutoff passes through unfiltered.
+
+    Jumps of more than `max_gap` seconds (a disconnect) are not bridged:
+    the filter restarts and the output grid restarts at the next sample.
+    """
+
+    def __init__(self, rate: float, num_channels: int, cutoff: float = None, order: int = 4,
+                 max_gap: float = 0.5, settle: int = 32, tolerance: float = 0.2):
+        self.rate = rate
+        self.num_channels = num_channels
+        self.cutoff = cutoff if cutoff is not None else 0.25 * rate
+        if not 0 < self.cutoff < rate / 2:
+            raise ValueError(f"cutoff {self.cutoff} Hz must be between 0 and the output Nyquist {rate / 2} Hz")
+        self.order = order
+        self.max_gap = max_gap
+        self.settle = settle
+        self.tolerance = tolerance
+        self.input_rate = None  # Hz the filter is designed for
+        self.filter = None
+        self._count = 0         # input samples since the last restart
+        self._window_end = 0    # value of _count that completes the current rate window
+        self._window_t = None   # time of the sample that started it
+        self._held = None       # (times, values) waiting for the input rate
+        self._last_t = None     # time of the last input sample
+        self._last_y = None     # its filtered value, where the next interpolation starts
+        self._origin = None     # time of output tick 0
+        self._tick = 0          # index of the next output tick
+
+    def reset(self):
+        if self.filter is not None:
+            self.filter.reset()
+        self._held = None
+        self._last_t = None
+        self._last_y = None
+
+    def _restart(self, t):
+        self.reset()
+        self._origin = t
+        self._tick = 0
+        self._count = 0
+        self._window_end = self.settle + 1
+        self._window_t = t
+
+    def _design(self, input_rate):
+        self.input_rate = input_rate
+        self.filter = None
+        if self.cutoff < input_rate / 2:
+            self.filter = SosFilter(lowpass_sos(self.cutoff, input_rate, self.order), self.num_channels)
+            if self._last_y is not None:
+                # Carry on from the current level rather than restarting from the next sample
+                self.filter.reset(self._last_y)
+
+    def _release(self, out_t, out_v):
+        """A segment ended before the input rate was known: design from what it has."""
+        times, values = self._held
+        self._held = None
+        if len(times) > 1:
+            self._design((len(times) - 1) / (times[-1] - times[0]))
+        self._emit(times, values, out_t, out_v)
+
+    def _emit(self, times, values, out_t, out_v):
+        """Filter one segment's samples and interpolate the output ticks they reach."""
+        filtered = values.copy() if self.filter is None else self.filter.process(values)
+        if self._last_t is not None:
+            times = np.concatenate(([self._last_t], times))
+            filtered = np.concatenate((self._last_y[None, :], filtered))
+        self._last_t, self._last_y = times[-1], filtered[-1]
+
+        # Output ticks in (previous sample, last sample]
+        last_tick = math.floor((times[-1] - self._origin) * self.rate + 1e-9)
+        if last_tick < self._tick:
+            return
+        ticks = self._origin + np.arange(self._tick, last_tick + 1) / self.rate
+        self._tick = last_tick + 1
+        out_t.append(ticks)
+        if len(times) == 1:
+            out_v.append(np.repeat(filtered, len(ticks), axis=0))
+            return
+        right = np.clip(np.searchsorted(times, ticks), 1, len(times) - 1)
+        left = right - 1
+        frac = (ticks - times[left]) / (times[right] - times[left])
+        out_v.append(filtered[left] + frac[:, None] * (filtered[right] - filtered[left]))
+
+    def process(self, times, values):
+        """
+        Feed n samples, times in seconds (increasing) and an (n, channels) block.
+
+        Returns (out_times, out_values) for every output tick up to the last
+        input time. Either may be empty if the block was too short.
+        """
+        times = np.asarray(times, dtype=np.float64).reshape(-1)
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.num_channels)
+        last_t = self._held[0][-1] if self._held is not None else self._last_t
+        # Out of order or duplicate packets are skipped
+        latest = np.maximum.accumulate(np.concatenate(([-np.inf if last_t is None else last_t], times)))
+        keep = times > latest[:-1]
+        times, values = times[keep], values[keep]
+        out_t = []
+        out_v = []
+
+        # Split at disconnects, each segment is filtered and interpolated in one go
+        previous = np.concatenate(([np.inf if last_t is None else last_t], times[:-1]))
+        starts = np.flatnonzero(times - previous > self.max_gap)
+        for segment_t, segment_x in zip(np.split(times, starts), np.split(values, starts)):
+            if not len(segment_t):
+                continue
+            if last_t is None or segment_t[0] - last_t > self.max_gap:
+                if self._held is not None:
+                    self._release(out_t, out_v)
+                self._restart(segment_t[0])
+            last_t = segment_t[-1]
+            while len(segment_t):
+                # Up to the end of the current rate window
+                n = min(len(segment_t), self._window_end - self._count)
+                piece_t, piece_x = segment_t[:n], segment_x[:n]
+                segment_t, segment_x = segment_t[n:], segment_x[n:]
+                self._count += n
+                if self._held is not None:
+                    piece_t = np.concatenate((self._held[0], piece_t))
+                    piece_x = np.concatenate((self._held[1], piece_x))
+                    self._held = None
+                input_rate = None
+                if self._count == self._window_end:
+                    input_rate = self.settle / (piece_t[-1] - self._window_t)
+                    self._window_t = piece_t[-1]
+                    self._window_end += self.settle
+                    if self.input_rate is None:
+                        self._design(input_rate)  # the first design also filters the samples held for it
+                if self.input_rate is None:
+                    self._held = piece_t, piece_x
+                    continue
+                self._emit(piece_t, piece_x, out_t, out_v)
+                if input_rate is not None and abs(input_rate - self.input_rate) > self.tolerance * self.input_rate:
+                    self._design(input_rate)
+
+        if not out_t:
+            return np.empty(0), np.empty((0, self.num_channels))
+        return np.concatenate(out_t), np.concatenate(out_v)
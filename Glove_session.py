@@ -0,0 +1,277 @@
+import csv
+import glob
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+from Glove_clock import ANCHOR_MARKER
+from Glove_recorder import GAP_MARKER
+
+# A session is a directory (adc_data_YYYYMMDD_HHMMSS.glv) holding
+#   header.json     channel names, device, calibration and the wall-clock anchor
+#   timestamps.i64  int64 nanoseconds since the anchor, one per sample
+#   channels.f32    float32 samples, row-major (samples, channels)
+#   gaps.i64        int64 (start, end) pairs, intervals where the link was down
+# Both data files are plain little-endian arrays that only ever grow, so a
+# session can be opened with np.memmap without parsing anything, even
+# while it is still being recorded.
+SESSION_SUFFIX = '.glv'
+HEADER_FILE = 'header.json'
+TIMESTAMPS_FILE = 'timestamps.i64'
+CHANNELS_FILE = 'channels.f32'
+GAPS_FILE = 'gaps.i64'
+SESSION_VERSION = 1
+
+TIMESTAMP_DTYPE = np.dtype('<i8')
+CHANNEL_DTYPE = np.dtype('<f4')
+
+
+class SessionWriter:
+    """
+    Appends samples to a session directory in chunks of `chunk_size` rows.
+
+    Samples are buffered in preallocated arrays and written when a chunk
+    fills up or on flush()/close(), so a crash loses at most one chunk.
+    """
+
+    def __init__(self, path: str, channel_names: list, device: str = None, calibration=None,
+                 wall_anchor: datetime = None, chunk_size: int = 4096):
+        self.path = path
+        self.num_channels = len(channel_names)
+        self.samples_written = 0
+        self.header = {
+            'version': SESSION_VERSION,
+            'channels': list(channel_names),
+            'device': device,
+            'calibration': None if calibration is None else np.asarray(calibration).tolist(),
+            'wall_anchor': (wall_anchor or datetime.now()).isoformat(),
+        }
+
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, HEADER_FILE), 'w') as file:
+            json.dump(self.header, file, indent=2)
+        self._ts_file = open(os.path.join(path, TIMESTAMPS_FILE), 'wb')
+        self._ch_file = open(os.path.join(path, CHANNELS_FILE), 'wb')
+        self._gap_file = open(os.path.join(path, GAPS_FILE), 'wb')
+
+        self._ts_chunk = np.empty(chunk_size, dtype=TIMESTAMP_DTYPE)
+        self._ch_chunk = np.empty((chunk_size, self.num_channels), dtype=CHANNEL_DTYPE)
+        self._fill = 0
+
+    @property
+    def rows(self):
+        """Samples appended so far, including those still waiting for the next flush."""
+        return self.samples_written + self._fill
+
+    def append(self, timestamps_ns, values):
+        """Append n int64 timestamps and an (n, channels) block of samples."""
+        timestamps_ns = np.asarray(timestamps_ns, dtype=TIMESTAMP_DTYPE).reshape(-1)
+        values = np.asarray(values).reshape(-1, self.num_channels)
+        start = 0
+        while start < len(timestamps_ns):
+            n = min(len(timestamps_ns) - start, len(self._ts_chunk) - self._fill)
+            self._ts_chunk[self._fill:self._fill + n] = timestamps_ns[start:start + n]
+            self._ch_chunk[self._fill:self._fill + n] = values[start:start + n]
+            self._fill += n
+            start += n
+            if self._fill == len(self._ts_chunk):
+                self.flush()
+
+    def mark_gap(self, start_ns: int, end_ns: int):
+        """Record that no data was received between two timestamps."""
+        self._gap_file.write(np.array([start_ns, end_ns], dtype=TIMESTAMP_DTYPE).tobytes())
+        self._gap_file.flush()
+
+    def flush(self):
+        if self._fill == 0:
+            return
+        # Channels first, so the timestamp file never claims rows that aren't there
+        self._ch_file.write(self._ch_chunk[:self._fill].tobytes())
+        self._ch_file.flush()
+        self._ts_file.write(self._ts_chunk[:self._fill].tobytes())
+        self._ts_file.flush()
+        self.samples_written += self._fill
+        self._fill = 0
+
+    def close(self):
+        self.flush()
+        self._ts_file.close()
+        self._ch_file.close()
+        self._gap_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Session:
+    """Read-only, memory-mapped view of a recorded session."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE)) as file:
+            self.header = json.load(file)
+        self.channel_names = self.header['channels']
+        self.wall_anchor = datetime.fromisoformat(self.header['wall_anchor'])
+
+        n_channels = len(self.channel_names)
+        ts_path = os.path.join(path, TIMESTAMPS_FILE)
+        ch_path = os.path.join(path, CHANNELS_FILE)
+        n = min(os.path.getsize(ts_path) // TIMESTAMP_DTYPE.itemsize,
+                os.path.getsize(ch_path) // (CHANNEL_DTYPE.itemsize * max(n_channels, 1)))
+        if n == 0:
+            self.timestamps = np.empty(0, dtype=TIMESTAMP_DTYPE)
+            self.channels = np.empty((0, n_channels), dtype=CHANNEL_DTYPE)
+        else:
+            self.timestamps = np.memmap(ts_path, dtype=TIMESTAMP_DTYPE, mode='r', shape=(n,))
+            self.channels = np.memmap(ch_path, dtype=CHANNEL_DTYPE, mode='r', shape=(n, n_channels))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def gaps(self):
+        """(n, 2) int64 array of (start, end) timestamps with no data."""
+        gap_path = os.path.join(self.path, GAPS_FILE)
+        if not os.path.exists(gap_path):
+            return np.empty((0, 2), dtype=TIMESTAMP_DTYPE)
+        return np.fromfile(gap_path, dtype=TIMESTAMP_DTYPE).reshape(-1, 2)
+
+    @property
+    def calibration(self):
+        cal = self.header.get('calibration')
+        return None if cal is None else np.asarray(cal)
+
+    def seconds(self):
+        """Sample times in seconds since the start of the session."""
+        return self.timestamps / 1e9
+
+    def channel(self, name):
+        return self.channels[:, self.channel_names.index(name)]
+
+
+def load_session(path: str) -> Session:
+    return Session(path)
+
+
+def csv_to_session(csv_path: str, session_path: str = None, device: str = None,
+                   calibration=None, chunk_size: int = 4096) -> str:
+    """
+    Convert one recorded adc_data_*.csv to a session directory.
+
+    Handles the current recorder format (Timestamp_ns, Channel_1, ...,
+    with a '# anchor' row), older files with datetime strings in the first
+    column, and Multi_func.save_to_csv output, where the header doesn't
+    match the row width. Datetime timestamps are stored relative to the
+    first row, which becomes the wall-clock anchor. '# gap' rows become
+    session gaps. Rows of the wrong width or that don't parse are skipped.
+    If the conversion fails, no session directory is left behind.
+    """
+    if session_path is None:
+        session_path = os.path.splitext(csv_path)[0] + SESSION_SUFFIX
+
+    writer = None
+    anchor = None
+    times = []
+    rows = []
+    gaps = []
+    try:
+        with open(csv_path, newline='') as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            in_ns = bool(header) and header[0].lower().endswith('_ns')
+
+            def to_ns(field):
+                if in_ns:
+                    return int(field)
+                return (datetime.fromisoformat(field) - anchor) // timedelta(microseconds=1) * 1000
+
+            for row in reader:
+                if not row:
+                    continue
+                if row[0] == ANCHOR_MARKER:
+                    anchor = datetime.fromisoformat(row[1])
+                    continue
+                if row[0] == GAP_MARKER:
+                    gaps.append((row[1], row[2]))
+                    continue
+                if row[0].startswith('#'):
+                    continue  # touch events and other markers aren't samples
+                if writer is None:
+                    if anchor is None:
+                        anchor = _anchor_from_name(csv_path) if in_ns else datetime.fromisoformat(row[0])
+                    num_channels = len(row) - 1
+                    names = header[1:] if header and len(header) == len(row) else \
+                        [f'Channel_{i+1}' for i in range(num_channels)]
+                    writer = SessionWriter(session_path, names, device=device, calibration=calibration,
+                                           wall_anchor=anchor, chunk_size=chunk_size)
+                if len(row) - 1 != writer.num_channels:
+                    continue
+                try:
+                    timestamp = to_ns(row[0])
+                    values = [float(v) for v in row[1:]]
+                except ValueError:
+                    continue  # a garbled row (e.g. cut off by a crash), skipped like one of the wrong width
+                times.append(timestamp)
+                rows.append(values)
+                if len(rows) == chunk_size:
+                    writer.append(times, np.array(rows, dtype=np.float64))
+                    times, rows = [], []
+
+            if writer is None:
+                raise ValueError(f"{csv_path} has no data rows")
+            if rows:
+                writer.append(times, np.array(rows, dtype=np.float64))
+            for start, end in gaps:
+                writer.mark_gap(to_ns(start), to_ns(end))
+    except BaseException:
+        # Don't leave a half-written session behind, it would be taken for a finished conversion
+        if writer is not None:
+            writer.close()
+            shutil.rmtree(session_path, ignore_errors=True)
+        raise
+    writer.close()
+    return session_path
+
+
+def _anchor_from_name(csv_path: str) -> datetime:
+    """Start time from an adc_data_YYYYMMDD_HHMMSS.csv name, else the file's modification time."""
+    try:
+        return datetime.strptime(os.path.basename(csv_path)[len('adc_data_'):][:15], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return datetime.fromtimestamp(os.path.getmtime(csv_path))
+
+
+def convert_archive(paths, device: str = None, calibration=None, overwrite: bool = False):
+    """Convert CSV files and/or directories of adc_data_*.csv files. Returns the new session paths."""
+    csv_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            csv_files += sorted(glob.glob(os.path.join(path, 'adc_data_*.csv')))
+        else:
+            csv_files.append(path)
+
+    converted = []
+    for csv_path in csv_files:
+        session_path = os.path.splitext(csv_path)[0] + SESSION_SUFFIX
+        if os.path.exists(session_path) and not overwrite:
+            print(f"Skipping {csv_path}, {session_path} already exists")
+            continue
+        try:
+            converted.append(csv_to_session(csv_path, session_path, device=device, calibration=calibration))
+        except ValueError as e:
+            print(f"Skipping {csv_path}: {e}")
+            continue
+        print(f"Converted {csv_path} -> {session_path}")
+    return converted
+
+
+# Usage:
+#   python Glove_session.py recordings/ adc_data_20250623_130130.csv
+if __name__ == "__main__":
+    convert_archive(sys.argv[1:] or ['.'])
@@ -0,0 +1,527 @@
+import asyncio
+import collections
+import json
+import os
+import threading
+import time
+
+from bleak import BleakScanner, BleakClient
+from bleak.exc import BleakError
+from Glove_clock import SessionClock
+from Glove_decoder import decode_packet
+from Glove_metrics import DISABLED
+
+CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
+DEVICE_NAME = "jeppe is 2 cool"
+
+# Last known addresses of the gloves, so we can connect without scanning
+DEVICE_CACHE = os.path.expanduser("~/.glove_devices.json")
+MAX_CACHED_ADDRESSES = 8  # gloves remembered per device name
+
+# What a full subscription does with a new sample
+DROP_OLDEST = 'drop_oldest'  # keep the newest samples (plotting)
+DROP_NEWEST = 'drop_newest'  # keep what is already queued
+BLOCK = 'block'              # hold up the stream until there is room (recording); drops after block_timeout
+COALESCE = 'coalesce'        # only ever keep the latest sample (robot hand, live displays)
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK, COALESCE)
+
+# Interval with no data because the BLE link was down, as monotonic_ns
+# timestamps. Sent to subscriptions created with gaps=True, in order with
+# the samples.
+Gap = collections.namedtuple('Gap', ['start', 'end'])
+
+
+def describe_queues(stats) -> str:
+    """One line with the subscriptions that lost, coalesced or held up samples, '' if none did."""
+    parts = []
+    for name, counters in stats.items():
+        losses = [f"{counters[key]} {key}" for key in ('dropped', 'coalesced', 'blocked') if counters[key]]
+        if losses:
+            parts.append(f"{name}: {', '.join(losses)} (max {counters['high_water']} queued)")
+    return '; '.join(parts)
+
+
+def split_gaps(batch):
+    """Separate a drained batch into (samples, gaps)."""
+    gaps = [item for item in batch if isinstance(item, Gap)]
+    if not gaps:
+        return batch, gaps
+    return [item for item in batch if not isinstance(item, Gap)], gaps
+
+
+class Subscription:
+    """
+    Bounded, thread-safe queue of (timestamp_ns, values) samples for one consumer.
+
+    Can be read from another thread (get/drain) or from a coroutine in
+    the stream's event loop (`async for sample in subscription`).
+    maxsize 0 means unbounded. With gaps=True the queue also receives
+    Gap markers when the stream reconnects; those are never dropped.
+
+    When the consumer falls behind, `policy` decides what gives:
+    DROP_OLDEST and DROP_NEWEST throw samples away (counted in `dropped`),
+    COALESCE replaces whatever is queued with the newest sample (counted
+    in `coalesced`), and BLOCK holds samples back for up to block_timeout
+    seconds until there is room (counted in `blocked`) before dropping.
+    put() runs in the BLE callback on the event loop, so it never waits:
+    a BLOCK subscription hands the samples that don't fit to its own
+    feeder thread, which does the waiting in order, and the stream, the
+    other subscribers and reconnects carry on. `high_water` is the
+    longest the queue has been.
+
+    pause() makes put() discard everything until resume(), so a consumer
+    can capture in windows while notifications keep running.
+    """
+
+    def __init__(self, maxsize: int = 1024, policy: str = DROP_OLDEST, name: str = None, gaps: bool = False,
+                 block_timeout: float = 1.0):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        self.maxsize = 1 if policy == COALESCE else maxsize
+        self.policy = policy
+        self.name = name
+        self.gaps = gaps
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked = 0
+        self.high_water = 0
+        self._items = collections.deque()
+        self._samples = 0  # queued items that aren't Gaps
+        self._cond = threading.Condition()
+        self._waiter = None  # (loop, asyncio.Event) of an async reader
+        self._backlog = collections.deque()  # (deadline, item) waiting for room, BLOCK only
+        self._feeder = None
+        self.closed = False
+        self.active = True
+
+    def _pop_oldest_sample(self):
+        gaps = []
+        while isinstance(self._items[0], Gap):
+            gaps.append(self._items.popleft())
+        self._items.popleft()
+        self._items.extendleft(reversed(gaps))
+        self._samples -= 1
+
+    def put(self, item):
+        if not self.active:
+            return
+        with self._cond:
+            if self.policy == BLOCK and (self._backlog or self._full(item)):
+                # Behind the samples already waiting, so the order is kept
+                self.blocked += not isinstance(item, Gap)
+                self._backlog.append((time.monotonic() + self.block_timeout, item))
+                if self._feeder is None:
+                    self._feeder = threading.Thread(target=self._feed, daemon=True,
+                                                    name=f'subscription-{self.name or id(self)}')
+                    self._feeder.start()
+                self._cond.notify_all()
+                return
+            if self._full(item):
+                if self.policy == COALESCE:
+                    self.coalesced += self._samples
+                    self._items = collections.deque(i for i in self._items if isinstance(i, Gap))
+                    self._samples = 0
+                else:
+                    self.dropped += 1
+                    if self.policy != DROP_OLDEST:
+                        return
+                    self._pop_oldest_sample()
+            self._append(item)
+        self._wake_reader()
+
+    def _full(self, item):
+        return not isinstance(item, Gap) and self.maxsize and self._samples >= self.maxsize
+
+    def _append(self, item):
+        self._items.append(item)
+        if not isinstance(item, Gap):
+            self._samples += 1
+        if len(self._items) > self.high_water:
+            self.high_water = len(self._items)
+        self._cond.notify_all()
+
+    def _wake_reader(self):
+        waiter = self._waiter
+        if waiter is not None:
+            loop, event = waiter
+            loop.call_soon_threadsafe(event.set)
+
+    def _feed(self):
+        """BLOCK feeder thread: move backlogged samples in as room appears, drop those that time out."""
+        with self._cond:
+            while not self.closed:
+                if not self._backlog:
+                    self._cond.wait()
+                    continue
+                deadline, item = self._backlog[0]
+                room = self._cond.wait_for(lambda: not self._full(item) or self.closed,
+                                           max(0.0, deadline - time.monotonic()))
+                if self.closed:
+                    break
+                self._backlog.popleft()
+                if not room:
+                    self.dropped += 1
+                    continue
+                self._append(item)
+                self._cond.release()
+                try:
+                    self._wake_reader()
+                finally:
+                    self._cond.acquire()
+
+    def pause(self):
+        self.active = False
+
+    def resume(self):
+        self.active = True
+
+    def stats(self):
+        """Counters for the UI and logs."""
+        return {'queued': len(self._items) + len(self._backlog), 'high_water': self.high_water,
+                'dropped': self.dropped, 'coalesced': self.coalesced, 'blocked': self.blocked}
+
+    def get(self, timeout: float = None):
+        """Block until a sample is available. Raises TimeoutError after `timeout` seconds."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout):
+                raise TimeoutError
+            if not self._items:
+                raise EOFError("subscription closed")
+            return self._take()
+
+    def drain(self):
+        """Return every queued sample, oldest first, without blocking."""
+        with self._cond:
+            items = list(self._items)
+            self._items.clear()
+            self._samples = 0
+            self._cond.notify_all()
+        return items
+
+    def _take(self):
+        item = self._items.popleft()
+        if not isinstance(item, Gap):
+            self._samples -= 1
+        self._cond.notify_all()
+        return item
+
+    def empty(self):
+        # Samples BLOCK is still holding back count, or a reader could stop early
+        return not self._items and not self._backlog
+
+    def __len__(self):
+        return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            # Nothing more is coming, so whatever still waits for room can be read now
+            for _, item in self._backlog:
+                self._append(item)
+            self._backlog.clear()
+            self._cond.notify_all()
+        self._wake_reader()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            with self._cond:
+                if self._items:
+                    return self._take()
+                if self.closed:
+                    raise StopAsyncIteration
+                if self._waiter is None:
+                    self._waiter = (asyncio.get_running_loop(), asyncio.Event())
+                event = self._waiter[1]
+                event.clear()
+            await event.wait()
+
+
+class GloveStream:
+    """
+    One BLE connection to the glove, fanned out to any number of subscribers.
+
+    Every notification is stamped with time.monotonic_ns(), decoded once
+    and the same (timestamp_ns, values) tuple is handed to each subscription, so the plotter, recorder,
+    calibrator etc. share the data without copies. Each subscriber picks
+    its own queue size and what happens when it falls behind.
+
+        stream = GloveStream()
+        plot_queue = stream.subscribe(maxsize=2000)
+        ble_thread = stream.start_thread(stop_event)
+
+    or from a coroutine:
+
+        async with GloveStream() as stream:
+            async for timestamp_ns, values in stream:
+                ...
+    """
+
+    def __init__(self, device_name: str = DEVICE_NAME, characteristic: str = CHARACTERISTIC_UUID,
+                 scan_timeout: float = 10.0, connect_timeout: float = 5.0, cache_file: str = DEVICE_CACHE,
+                 reconnect_delay: float = 0.5, max_reconnect_delay: float = 30.0, clock: SessionClock = None,
+                 replay=None, metrics=None, address: str = None, claimed: set = None):
+        self.device_name = device_name.lower()
+        # A fixed address picks one glove when several share the name; otherwise
+        # gloves whose address is in `claimed` (shared by the streams of one
+        # process) are skipped, so each stream ends up with a different glove
+        self.pinned_address = address
+        self.claimed = claimed if claimed is not None else set()
+        self.characteristic = characteristic
+        self.scan_timeout = scan_timeout
+        self.connect_timeout = connect_timeout
+        self.cache_file = cache_file
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.clock = clock if clock is not None else SessionClock()
+        self.metrics = metrics if metrics is not None else DISABLED  # times the notification handler
+
+        # Offline stand-in for the glove (Glove_replay.ReplayClient), also picked up from GLOVE_REPLAY
+        if replay is None and os.environ.get('GLOVE_REPLAY'):
+            from Glove_replay import ReplayClient
+            replay = ReplayClient.from_env()
+        self.replay = replay
+        self.client = None
+        self.name = None
+        self.address = None
+        self.connect_time = None
+        self.notifying = False
+        self.packets = 0
+        self.invalid_packets = 0
+        self.reconnects = 0
+        self.gaps = []  # every Gap of this session
+        self._link_lost_at = None
+        self._closing = False
+        self._subscriptions = []
+
+    def subscribe(self, maxsize: int = 1024, policy: str = DROP_OLDEST, name: str = None,
+                  gaps: bool = False, block_timeout: float = 1.0) -> Subscription:
+        subscription = Subscription(maxsize, policy, name, gaps, block_timeout)
+        self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def queue_stats(self):
+        """Subscription name -> its counters."""
+        return {s.name or f'subscription_{i}': s.stats() for i, s in enumerate(self._subscriptions)}
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+        subscription.close()
+
+    def _notification_handler(self, sender, data):
+        started = self.metrics.start()
+        timestamp = time.monotonic_ns()
+        try:
+            _, values = decode_packet(data)
+        except ValueError as e:
+            self.invalid_packets += 1
+            print(f"Skipping invalid data: {data}, error: {e}")
+            return
+        self.packets += 1
+        sample = (timestamp, values)
+        for subscription in self._subscriptions:
+            subscription.put(sample)
+        self.metrics.stop('ble_callback', started)
+
+    async def connect(self):
+        """
+        Connect to the glove. Raises RuntimeError if it isn't advertising.
+
+        Tries the cached addresses not claimed by another stream first, then
+        scans until the first device with a matching name shows up (or
+        scan_timeout runs out). With a replay client there is nothing to find.
+        """
+        start = time.perf_counter()
+        if self.client is not None and self.client.is_connected:
+            # Still up from an earlier connect (start() failed after it): close it rather than leak it
+            await self.disconnect()
+        if self.replay is not None:
+            self.client = self.replay
+            self.client.disconnected_callback = self._disconnected_handler
+            await self.client.connect()
+            self.name, self.address = self.client.name, self.client.address
+            self.connect_time = time.perf_counter() - start
+            print(f"Replaying into {self.name}.")
+            return
+
+        # Reconnect to the same glove; a pinned or cached address saves a scan
+        if self.pinned_address or self.address:
+            candidates = [self.pinned_address or self.address]
+        else:
+            candidates = load_device_cache(self.cache_file).get(self.device_name, [])
+        for cached in candidates:
+            # Another stream may have that glove; claim before awaiting, so
+            # streams connecting at the same time never pick the same one
+            if cached in self.claimed and cached != self.address:
+                continue
+            self.claimed.add(cached)
+            print(f"Connecting to cached address {cached}...")
+            client = BleakClient(cached, timeout=self.connect_timeout,
+                                 disconnected_callback=self._disconnected_handler)
+            try:
+                await client.connect()
+                self.client, self.name, self.address = client, self.device_name, cached
+                break
+            except Exception as e:  # stale address, out of range, ...
+                if cached != self.address:
+                    # Our own glove stays claimed until run() exits, or a sibling could take it meanwhile
+                    self.claimed.discard(cached)
+                print(f"Cached address {cached} failed ({e!r}).")
+
+        if self.client is None or not self.client.is_connected:
+            print("Scanning for BLE devices...")
+            device = await BleakScanner.find_device_by_filter(self._wanted, timeout=self.scan_timeout)
+            if not device:
+                raise RuntimeError(f"BLE device '{self.pinned_address or self.device_name}' not found.")
+            if device.address in self.claimed and device.address != self.address:
+                raise RuntimeError(f"{device.address} was taken by another stream meanwhile.")
+            self.claimed.add(device.address)
+
+            print(f"Found device: {device.name} ({device.address}). Attempting to connect...")
+            self.client = BleakClient(device, timeout=self.connect_timeout,
+                                      disconnected_callback=self._disconnected_handler)
+            try:
+                await self.client.connect()
+            except BaseException:
+                if device.address != self.address:
+                    self.claimed.discard(device.address)
+                raise
+            if self.address not in (None, device.address):
+                self.claimed.discard(self.address)  # moved to another glove, let ours go
+            self.name, self.address = device.name, device.address
+            if not self.pinned_address:
+                save_device_cache(self.cache_file, self.device_name, device.address)
+
+        self.connect_time = time.perf_counter() - start
+        print(f"Connected to {self.name} in {self.connect_time:.2f} s!")
+
+    def _wanted(self, device, advertisement=None):
+        if self.pinned_address:
+            return device.address == self.pinned_address
+        if device.address in self.claimed and device.address != self.address:
+            return False
+        return bool(device.name) and self.device_name in device.name.lower()
+
+    async def start(self):
+        """Start BLE notifications."""
+        if not self.notifying:
+            await self.client.start_notify(self.characteristic, self._notification_handler)
+            self.notifying = True
+
+    async def stop(self):
+        """Stop BLE notifications, keeping the connection."""
+        if self.notifying:
+            self.notifying = False
+            await self.client.stop_notify(self.characteristic)
+
+    async def disconnect(self):
+        if self.client is not None and self.client.is_connected:
+            self._closing = True
+            try:
+                await self.stop()
+                await self.client.disconnect()
+            finally:
+                self._closing = False
+            print("Disconnected from BLE device.")
+
+    async def __aenter__(self):
+        await self.connect()
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    def __aiter__(self):
+        return self.subscribe(name='aiter').__aiter__()
+
+    def _disconnected_handler(self, client):
+        self.notifying = False
+        if not self._closing and self._link_lost_at is None:
+            self._link_lost_at = time.monotonic_ns()
+            print(f"Lost connection to {self.name} at {self.clock.to_datetime(self._link_lost_at):%H:%M:%S}.")
+
+    def _close_gap(self):
+        """Publish the gap that started when the link dropped."""
+        if self._link_lost_at is None:
+            return
+        gap = Gap(self._link_lost_at, time.monotonic_ns())
+        self._link_lost_at = None
+        self.gaps.append(gap)
+        print(f"No data for {(gap.end - gap.start) / 1e9:.1f} s.")
+        for subscription in self._subscriptions:
+            if subscription.gaps:
+                subscription.put(gap)
+
+    async def run(self, stop_event: threading.Event, reconnect: bool = True):
+        """
+        Stream until stop_event is set, then close every subscription.
+
+        If the link drops (or the first connect fails) and reconnect is
+        True, keeps retrying with exponential backoff. Every interval
+        without data is published as a Gap.
+        """
+        delay = self.reconnect_delay
+        try:
+            while not stop_event.is_set():
+                try:
+                    await self.connect()
+                    await self.start()
+                    self._close_gap()
+                    delay = self.reconnect_delay
+                    print("Notifications started. Waiting for stop_event...")
+                    while not stop_event.is_set() and self.client.is_connected:
+                        await asyncio.sleep(0.1)
+                except (RuntimeError, BleakError, OSError, asyncio.TimeoutError) as e:
+                    print(f"BLE error: {e}")
+
+                if stop_event.is_set() or not reconnect:
+                    break
+                if self._link_lost_at is None:
+                    self._link_lost_at = time.monotonic_ns()
+                self.reconnects += 1
+                print(f"Reconnecting in {delay:.1f} s...")
+                end_time = time.monotonic() + delay
+                while not stop_event.is_set() and time.monotonic() < end_time:
+                    await asyncio.sleep(0.1)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        finally:
+            await self.disconnect()
+            self.claimed.discard(self.address)
+            self._close_gap()
+            for subscription in self._subscriptions:
+                subscription.close()
+        print("BLE thread exiting.")
+
+    def start_thread(self, stop_event: threading.Event) -> threading.Thread:
+        """Run the stream in its own thread and event loop, like the visualisers need."""
+        thread = threading.Thread(target=lambda: asyncio.run(self.run(stop_event)), daemon=True)
+        thread.start()
+        return thread
+
+
+def load_device_cache(cache_file: str = DEVICE_CACHE) -> dict:
+    """Device name -> addresses of the gloves with that name, most recently reached first."""
+    try:
+        with open(cache_file) as file:
+            cache = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    # Older caches kept a single address per name
+    return {name: [addresses] if isinstance(addresses, str) else addresses for name, addresses in cache.items()}
+
+
+def save_device_cache(cache_file: str, device_name: str, address: str):
+    cache = load_device_cache(cache_file)
+    addresses = cache.get(device_name, [])
+    if addresses[:1] == [address]:
+        return
+    cache[device_name] = ([address] + [a for a in addresses if a != address])[:MAX_CACHED_ADDRESSES]
+    try:
+        with open(cache_file, 'w') as file:
+            json.dump(cache, file, indent=2)
+    except OSError as e:
+        print(f"Could not save device cache: {e}")
@@ -0,0 +1,88 @@
+import collections
+
+import numpy as np
+
+# time in monotonic ns (like the samples), channel index, pressed or released,
+# and the reading that caused it
+TouchEvent = collections.namedtuple('TouchEvent', ['time', 'channel', 'pressed', 'value'])
+
+
+class TouchDetector:
+    """
+    Press/release events for the pressure pads, from new samples only.
+
+        touch = TouchDetector(channels=[3, 4, 5])
+        touch.subscribe(lambda event: print(event))
+        touch.process(timestamps_ns, values)   # returns the new events too
+
+    A pad's resistance drops when it is pressed. A reading below 0 (open
+    circuit) or above open_level never counts as a touch. Every channel
+    has a baseline, the untouched resistance, which starts at open_level
+    and follows the untouched readings slowly (alpha per sample). A pad is
+    pressed once it reads press_pct below its baseline and released once
+    it is back within release_pct of it, so noise around a single
+    threshold doesn't make it flicker. All channels and all samples of a
+    block are handled with array operations.
+    """
+
+    def __init__(self, channels, press_pct: float = 0.05, release_pct: float = 0.02,
+                 open_level: float = 900000, baseline=None, alpha: float = 0.01):
+        if not 0 <= release_pct < press_pct < 1:
+            raise ValueError("need 0 <= release_pct < press_pct < 1")
+        self.channels = np.asarray(channels)
+        self.press_pct = press_pct
+        self.release_pct = release_pct
+        self.open_level = open_level
+        self.alpha = alpha
+        self.initial_baseline = baseline
+        self.listeners = []
+        self.reset()
+
+    def reset(self):
+        baseline = self.open_level if self.initial_baseline is None else self.initial_baseline
+        self.baseline = np.broadcast_to(np.asarray(baseline, dtype=np.float64), self.channels.shape).copy()
+        self.pressed = np.zeros(len(self.channels), dtype=bool)
+        self.presses = 0
+
+    def subscribe(self, callback):
+        """Call callback(event) for every press and release."""
+        self.listeners.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.listeners.remove(callback)
+
+    def process(self, timestamps_ns, block):
+        """Update with an (n, num_channels) block, returns the events it caused in time order."""
+        values = np.asarray(block, dtype=np.float64).reshape(len(timestamps_ns), -1)[:, self.channels]
+        if len(values) == 0:
+            return []
+        valid = (values >= 0) & (values <= self.open_level)
+        press = valid & (values < self.baseline * (1 - self.press_pct))
+        release = ~valid | (values > self.baseline * (1 - self.release_pct))
+
+        # Hysteresis: each sample takes the state of the last press or
+        # release at or before it, or the previous block's state
+        rows = np.arange(len(values))[:, None]
+        last = np.maximum.accumulate(np.where(press | release, rows, -1), axis=0)
+        columns = np.arange(len(self.channels))
+        state = np.where(last >= 0, press[np.maximum(last, 0), columns], self.pressed)
+
+        # Let the baseline follow the untouched readings
+        idle = valid & ~state
+        count = idle.sum(axis=0)
+        seen = count > 0
+        if seen.any():
+            mean = np.where(idle, values, 0).sum(axis=0)[seen] / count[seen]
+            weight = 1 - (1 - self.alpha) ** count[seen]
+            self.baseline[seen] += weight * (mean - self.baseline[seen])
+
+        changed = state != np.vstack((self.pressed, state[:-1]))
+        self.pressed = state[-1].copy()
+        events = [TouchEvent(int(timestamps_ns[i]), int(self.channels[c]), bool(state[i, c]), float(values[i, c]))
+                  for i, c in zip(*np.nonzero(changed))]
+        for event in events:
+            self.presses += event.pressed
+            for callback in self.listeners:
+                callback(event)
+        return events
@@ -1,73 +1,78 @@
 import asyncio
-import csv
 import math
 from datetime import datetime, timedelta
-from bleak import BleakScanner, BleakClient
+from Glove_collect import ChunkedCollector
+from Glove_stream import GloveStream
 
-CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
 # COLLECTION_DURATION_SECONDS = 5  # Set how long to collect per session
-CSV_FILENAME = "adc_data.csv"
-
-collected_data = []
-
-def notification_handler(sender, data):
-    try:
-        values = [float(x) for x in data.decode().split(',')]
-        timestamp = datetime.now()
-        collected_data.append((timestamp, values))
-        print(f"[{timestamp.strftime('%H:%M:%S')}] {values}")
-    except ValueError as e:
-        print(f"Invalid data: {data} — {e}")
+COLLECTION_PATH = "adc_data.glv"  # Glove_collect session, one tagged segment per finger/angle
 
 async def scan_and_connect():
-    print("Scanning for BLE devices...")
-    devices = await BleakScanner.discover()
-    device = next((d for d in devices if d.name and "jeppe is cool" in d.name.lower()), None)
+    stream = GloveStream()
+    await stream.connect()
+    return stream
 
-    if not device:
-        raise RuntimeError("BLE device with 'jeppe is Cool' not found.")
+async def collect_once(stream, samples, duration_seconds, collector=None):
+    """
+    One collection window from a paused subscription of a stream that is
+    already notifying, so starting and ending a window costs nothing.
+    With a Glove_collect.ChunkedCollector the samples go straight to disk
+    and the number collected is returned, otherwise a fresh list of them.
+    """
+    collected_data = []
+    count = 0
+    dropped = samples.dropped
 
-    client = BleakClient(device.address)
-    await client.connect()
-    print(f"Connected to {device.name}")
-    return client
-
-async def collect_once(client, duration_seconds):
-    await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
+    def store(batch):
+        nonlocal count
+        for timestamp, values in batch:
+            print(f"[{stream.clock.to_datetime(timestamp):%H:%M:%S}] {values}")
+        if collector is not None and batch:
+            collector.append([t for t, _ in batch], [v for _, v in batch])
+        else:
+            collected_data.extend(batch)
+        count += len(batch)
 
+    samples.resume()
     end_time = datetime.now() + timedelta(seconds=duration_seconds)
     while datetime.now() < end_time:
         await asyncio.sleep(0.1)
+        store(samples.drain())
 
-    await client.stop_notify(CHARACTERISTIC_UUID)
+    samples.pause()
+    store(samples.drain())
+    if samples.dropped > dropped:
+        print(f"{samples.dropped - dropped} samples were dropped, the queue was full.")
     print(f"Data collection ended after {duration_seconds} seconds.\n")
-
-def save_to_csv(data, filename):
-    with open(filename, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        # Write header row
-        writer.writerow(["timestamp", "value_1", "value_2", "value_3", "..."])
-        for timestamp, values in data:
-            writer.writerow([timestamp.isoformat()] + values)
-    print(f"Data saved to {filename}")
+    return count if collector is not None else collected_data
 
 async def main(COLLECTION_DURATION_SECONDS, finger, angle):
-    client = await scan_and_connect()
+    stream = await scan_and_connect()
+    # Every collection goes to disk in chunks as it arrives, so a crash
+    # loses at most a chunk and memory doesn't grow with the session
+    collector = ChunkedCollector(COLLECTION_PATH, stream.clock, device=stream.name)
+    # Notify for the whole session and only let samples through while collecting
+    samples = stream.subscribe(maxsize=4096, name='collect')
+    samples.pause()
+    await stream.start()
 
     try:
         for i in range(finger*angle):
-            user_input = input("Press Enter to collect data for Finger %i at degrees %d" %(math.floor(i/angle)+1, i%angle+1)).strip()
+            # The prompt waits in a thread, the event loop keeps serving the glove meanwhile
+            user_input = (await asyncio.to_thread(input, "Press Enter to collect data for Finger %i at degrees %d" %(math.floor(i/angle)+1, i%angle+1))).strip()
             if user_input.lower() == 'exit':
                 break
 
             print("Collecting data...")
-            await collect_once(client, COLLECTION_DURATION_SECONDS)
+            collector.begin(session=i, finger=math.floor(i/angle)+1, angle=i%angle+1)
+            await collect_once(stream, samples, COLLECTION_DURATION_SECONDS, collector)
     finally:
-        if client.is_connected:
-            await client.disconnect()
-            print("Disconnected from BLE device.")
+        await stream.disconnect()
+        collection = collector.close()
 
-    save_to_csv(collected_data, CSV_FILENAME)
+    if collection is not None:
+        print(f"Data saved to {COLLECTION_PATH} ({len(collection)} samples in {len(collection.segments)} collections)")
+    return collection
 
 # if __name__ == "__main__":
 #     COLLECTION_DURATION_SECONDS = 5
@@ -1,95 +1,38 @@
-import asyncio
 import threading
-import queue
 import time
-import csv
-from datetime import datetime
+import numpy as np
+from Glove_recorder import CsvRecorder
+from Glove_stream import GloveStream, Gap, DROP_OLDEST, describe_queues
 
 import matplotlib.pyplot as plt
-from bleak import BleakScanner, BleakClient
 
-CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
+# One BLE connection, shared by everything that needs the glove data
+stream = GloveStream()
 
-# Thread-safe queue to store data for plotting and CSV-writing
-data_queue = queue.Queue()
+# Thread-safe queue to store data for plotting and CSV-writing. Bounded, so a
+# stalled window (dragged, slow redraw) costs the oldest samples instead of
+# memory and seconds of lag; losses are counted and shown on the plot
+data_queue = stream.subscribe(maxsize=4096, policy=DROP_OLDEST, name='plot', gaps=True)
 
 # Event to signal when to stop BLE notifications
 stop_event = threading.Event() 
 
 # Name for CSV file
-csv_filename = f'adc_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-
-
-def notification_handler(sender, data):
-    """
-    This callback executes in Bleak's event loop (the separate thread).
-    It parses data and places it into the queue. The main thread will
-    handle CSV-writing and plotting.
-    """
-    # Assume the data is a comma-separated string, e.g. "-1.00, 2.50, 3.00, ..."
-    decoded_data = data.decode().split(',')
-    timestamp = datetime.now()
-
-    try:
-        # Parse each value as a float
-        values = [float(x) for x in decoded_data]
-    except ValueError as e:
-        # If there's any invalid float, skip and log the error
-        print(f"Skipping invalid data: {decoded_data}, error: {e}")
-        return
-
-    # Put data (timestamp + values) into the queue for the main thread
-    data_queue.put((timestamp, values))
-
-
-async def bleak_main():
-    """
-    - Discover and connect to the BLE device
-    - Start notifications
-    - Remain active until stop_event is signaled
-    """
-    print("Scanning for BLE devices...")
-    devices = await BleakScanner.discover()
-    device = next((d for d in devices if d.name and "jeppe is 2 cool" in d.name.lower()), None)
-
-    if not device:
-        print("Device not found. Exiting BLE thread.")
-        return
-
-    print(f"Found device: {device.name} ({device.address}). Attempting to connect...")
-    async with BleakClient(device.address) as client:
-        print(f"Connected to {device.name}!")
-
-        # Start BLE notifications
-        await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
-        print("Notifications started. Waiting for stop_event...")
-
-        # Keep the async loop alive until we set stop_event
-        while not stop_event.is_set():
-            await asyncio.sleep(0.1)
-
-        # Optionally stop notifications if desired
-        await client.stop_notify(CHARACTERISTIC_UUID)
-        print("Stopped notifications.")
-
-    print("BLE thread exiting.")
-
-
-def run_bleak_loop():
-    """Target for the separate thread to run BLE asynchronously."""
-    asyncio.run(bleak_main())
+csv_filename = f'adc_data_{stream.clock.wall.strftime("%Y%m%d_%H%M%S")}.csv'
 
 
 if __name__ == "__main__":
     # Start the BLE thread
-    ble_thread = threading.Thread(target=run_bleak_loop, daemon=True)
-    ble_thread.start()
+    ble_thread = stream.start_thread(stop_event)
 
     # --------------------
     # Set up real-time plot
     # --------------------
     plt.ion()
     fig, ax = plt.subplots(figsize=(12, 6))
+    queue_text = fig.text(0.99, 0.01, '', fontsize=8, ha='right', va='bottom')
+    queue_report = ''
+    last_queue_check = 0
 
     # We’ll initialize lines once we know the number of channels
     lines = []
@@ -99,8 +42,9 @@ if __name__ == "__main__":
     data_buffer = []
     buffer_size = 2000  # keep up to 100 data points
 
-    # Track whether we have written the CSV header yet
-    csv_header_written = False
+    # CSV recorder, started once we know the number of channels
+    recorder = None
+    pending_gaps = []  # disconnects not yet marked in the CSV
 
     # For measuring relative time on the X-axis
     first_timestamp = None
@@ -109,7 +53,11 @@ if __name__ == "__main__":
         while True:
             # Retrieve any new data from the queue
             while not data_queue.empty():
-                timestamp, values = data_queue.get()
+                item = data_queue.get()
+                if isinstance(item, Gap):
+                    pending_gaps.append(item)
+                    continue
+                timestamp, values = item
 
                 # If this is the first data, set up channels
                 if num_channels == 0:
@@ -126,13 +74,10 @@ if __name__ == "__main__":
                     ax.set_title('Real-time ADC Data')
                     ax.legend(loc = "upper left")
 
-                # If we haven't written the CSV header, do it now
-                if not csv_header_written:
-                    with open(csv_filename, 'w', newline='') as file:
-                        writer = csv.writer(file)
-                        header = ['Timestamp'] + [f'Channel_{i+1}' for i in range(num_channels)]
-                        writer.writerow(header)
-                    csv_header_written = True
+                # If we haven't started the CSV recorder, do it now
+                if recorder is None:
+                    header = ['Timestamp_ns'] + [f'Channel_{i+1}' for i in range(num_channels)]
+                    recorder = CsvRecorder(csv_filename, header, stop_event=stop_event, clock=stream.clock)
 
                 # Append data to buffer
                 if first_timestamp is None:
@@ -142,15 +87,19 @@ if __name__ == "__main__":
                 if len(data_buffer) > buffer_size:
                     data_buffer.pop(0)
 
-                # Write this data row to CSV (append mode)
-                with open(csv_filename, 'a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([timestamp] + values)
+                # Hand this data row to the CSV recorder
+                recorder.write_samples([timestamp], [values])
+
+            # Mark intervals where the glove was disconnected
+            if recorder is not None and pending_gaps:
+                for gap in pending_gaps:
+                    recorder.mark_gap(gap.start, gap.end)
+                pending_gaps = []
 
             # Update the plot if we have data
             if data_buffer and lines:
                 # Generate array of times in seconds relative to the first timestamp
-                times = [(dp[0] - first_timestamp).total_seconds() for dp in data_buffer]
+                times = (np.array([dp[0] for dp in data_buffer]) - first_timestamp) / 1e9
 
                 # Update each channel’s line data
                 for i in range(num_channels):
@@ -160,6 +109,15 @@ if __name__ == "__main__":
                 ax.relim()
                 ax.autoscale_view()
 
+            # Show (and log) samples lost to a stalled window
+            if time.monotonic() - last_queue_check > 0.5:
+                last_queue_check = time.monotonic()
+                report = describe_queues(stream.queue_stats())
+                if report != queue_report:
+                    queue_report = report
+                    queue_text.set_text(report)
+                    print(f"Queues: {report}")
+
             # Redraw the figure
             fig.canvas.draw()
             fig.canvas.flush_events()
@@ -179,6 +137,11 @@ if __name__ == "__main__":
         stop_event.set()
         ble_thread.join()
 
+        # Flush the remaining rows to disk
+        if recorder is not None:
+            recorder.stop()
+            print(recorder.summary())
+
         # Clean up the plot
         plt.close(fig)
         print("Done.")
@@ -2,6 +2,9 @@
 // The number of fingers involved can be changed by editing num_digits.
 // The min and max resistances corresponding to relaxed and maximal bending of the fingers in the glove need to be hardcoded
 // Created on 21/06/2025
+// Built with SERIAL_COMMANDS set to 1, the servo angles instead come ready-made from the PC (Glove_bridge.py),
+// which uses the glove calibration, so nothing needs hardcoding here. The servos then only follow
+// the serial commands; the BLE readings are still received but no longer move them.
 
 #include "BLEDevice.h"
 #include <Wire.h>
@@ -36,6 +39,15 @@ struct digit {
 char received_str[100];
 digit my_digits[num_digits];
 
+// Commands from Glove_bridge.py: 'R','H', digit count, uint32 sequence, 5 servo angles (12 bytes)
+#ifndef SERIAL_COMMANDS
+#define SERIAL_COMMANDS 0 // 1 = servos follow Glove_bridge.py over serial instead of the BLE readings
+#endif
+#define COMMAND_SIZE 12
+#define COMMAND_ANGLES 7 // offset of the first angle
+uint8_t command_buf[COMMAND_SIZE];
+size_t command_len = 0;
+
 void init_digits(){
   for (int i = 0; i < num_digits ; i++){
     my_digits[i].pin = i+1;
@@ -102,6 +114,38 @@ void set_servos(){
 }
 
 
+// Read whatever commands have arrived and keep only the newest. Returns true if there was one
+bool read_serial_command(){
+  bool got_command = false;
+  while (Serial.available()) {
+    uint8_t b = Serial.read();
+    // Resynchronise on the 'RH' magic
+    if (command_len == 0 && b != 'R') continue;
+    if (command_len == 1 && b != 'H') {
+      command_len = (b == 'R') ? 1 : 0;
+      continue;
+    }
+    command_buf[command_len++] = b;
+    if (command_len == COMMAND_SIZE) {
+      command_len = 0;
+      uint8_t count = command_buf[2];
+      for (int i = 0; i < num_digits && i < count; i++) {
+        my_digits[i].angle = command_buf[COMMAND_ANGLES + i];
+      }
+      got_command = true;
+    }
+  }
+  return got_command;
+}
+
+
+void write_servos(){
+  for (int i = 0 ; i < num_digits ; i++){
+    my_digits[i].servo.write(my_digits[i].angle);
+  }
+}
+
+
 /////////////// BLE STUFF ///////////////////////
 
 //BLE Server name (the other ESP32 name running the server sketch)
@@ -236,8 +280,17 @@ void loop() {
     //pixels.show();
     new_data = false;
     split_data();
+#if !SERIAL_COMMANDS
     set_servos();
+#endif
+  }
+#if SERIAL_COMMANDS
+  if (read_serial_command()) {
+    write_servos();
   }
+  delay(5); // commands can arrive every 20 ms
+#else
   delay(50);
+#endif
 
 }
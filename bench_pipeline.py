@@ -0,0 +1,262 @@
+"""
+Benchmarks for the glove data pipeline, no Bluetooth needed.
+
+Drives synthetic glove traffic through each stage on its own (decode,
+moving-average and IIR filters, angle mapping, touch detection, CSV
+recording, headless plot update) and then end to end through
+GloveStream + ReplayClient. Prints packets/sec, p50/p99 latency per call
+and peak traced memory for every stage as JSON.
+
+    python bench_pipeline.py --channels 6 10 16 --packets 20000 --output bench.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from Glove_buffer import RingBuffer, MovingAverage
+from Glove_clock import SessionClock
+from Glove_decoder import decode_packet, encode_ascii, encode_frame
+from Glove_filter import FilterBank
+from Glove_fit import AngleMapper, AngleTable
+from Glove_recorder import CsvRecorder
+from Glove_render import BlitRenderer
+from Glove_replay import ReplayClient, synthetic_source
+from Glove_resample import Resampler
+from Glove_stream import BLOCK, GloveStream
+from Glove_touch import TouchDetector
+
+FINGERS = 3
+MEMORY_CALLS = 200  # calls repeated under tracemalloc for the memory figure
+
+
+def measure(name, step, n_calls, packets_per_call):
+    """Time n_calls of step(i), then rerun a few under tracemalloc for peak memory."""
+    latencies = np.empty(n_calls, dtype=np.int64)
+    for i in range(n_calls):
+        start = time.perf_counter_ns()
+        step(i)
+        latencies[i] = time.perf_counter_ns() - start
+
+    tracemalloc.start()
+    for i in range(min(n_calls, MEMORY_CALLS)):
+        step(i)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total = latencies.sum() / 1e9
+    return {
+        'stage': name,
+        'calls': n_calls,
+        'packets_per_call': packets_per_call,
+        'packets_per_sec': n_calls * packets_per_call / total if total else None,
+        'p50_us': float(np.percentile(latencies, 50)) / 1e3,
+        'p99_us': float(np.percentile(latencies, 99)) / 1e3,
+        'peak_kib': peak / 1024,
+    }
+
+
+def max_rss_kib():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform == 'darwin' else rss
+
+
+def synthetic_block(num_channels, n):
+    source = synthetic_source(num_channels, rate=100.0)
+    return np.array([values for _, (_, values) in zip(range(n), source)])
+
+
+def stage_benchmarks(num_channels, packets, block, workdir):
+    data = synthetic_block(num_channels, packets)
+    n_blocks = packets // block
+    blocks = [data[i * block:(i + 1) * block] for i in range(n_blocks)]
+    finger_cal = np.tile([-0.004, 780.0], (FINGERS, 1))
+    results = []
+
+    ascii_payloads = [bytearray(encode_ascii(v)) for v in data]
+    binary_payloads = [bytearray(encode_frame(v, i)) for i, v in enumerate(data)]
+    results.append(measure('decode_ascii', lambda i: decode_packet(ascii_payloads[i]), packets, 1))
+    results.append(measure('decode_binary', lambda i: decode_packet(binary_payloads[i]), packets, 1))
+
+    smoother = MovingAverage(11, num_channels)
+    results.append(measure('moving_average', lambda i: smoother.process(blocks[i]), n_blocks, block))
+
+    lowpass = FilterBank(num_channels, lowpass=1.5, notches=[5.0], rate=20.0)
+    block_times = np.arange(block, dtype=np.int64) * 50_000_000
+    results.append(measure('iir_filter', lambda i: lowpass.process(block_times, blocks[i]), n_blocks, block))
+
+    buffer = RingBuffer(10000, num_channels)
+    results.append(measure('ring_buffer', lambda i: buffer.extend(blocks[i]), n_blocks, block))
+
+    mapper = AngleMapper(finger_cal, buffer_size=10000)
+    results.append(measure('angle_mapping', lambda i: mapper.process(blocks[i]), n_blocks, block))
+    points = np.array([[215000, 270000, 327000, 330000]] * FINGERS, dtype=np.float64)  # bends like Finger_angle.npy
+    lut_mapper = AngleMapper(AngleTable.fit(points, [0, 45, 90, 110]), buffer_size=10000)
+    results.append(measure('angle_lut', lambda i: lut_mapper.process(blocks[i]), n_blocks, block))
+    touch = TouchDetector(range(FINGERS, 2 * FINGERS))
+    results.append(measure('touch_detect', lambda i: touch.process(block_times, blocks[i]), n_blocks, block))
+
+    clock = SessionClock()
+    timestamps = clock.now() + np.arange(block, dtype=np.int64) * 10_000_000
+    header = ['Timestamp_ns'] + [f'Channel_{i+1}' for i in range(num_channels)]
+    recorder = CsvRecorder(os.path.join(workdir, f'bench_{num_channels}.csv'), header, clock=clock,
+                           max_queue=0)
+    result = measure('csv_record', lambda i: recorder.write_samples(timestamps, blocks[i]), n_blocks, block)
+    flush_start = time.perf_counter()
+    recorder.stop()
+    result['final_flush_ms'] = (time.perf_counter() - flush_start) * 1e3
+    results.append(result)
+
+    fig, ax = plt.subplots()
+    lines = [ax.plot([], [])[0] for _ in range(FINGERS)]
+    renderer = BlitRenderer(fig)
+    renderer.add(ax, lines)
+    times = np.arange(1000) / 60.0
+    plot_data = np.clip(synthetic_block(num_channels, 1000)[:, :FINGERS] * -0.004 + 780, 0, 110)
+
+    def plot_step(i):
+        shifted = times + i / 60.0
+        for f, line in enumerate(lines):
+            line.set_data(shifted, plot_data[:, f])
+        renderer.update(True)
+
+    results.append(measure('plot_update', plot_step, max(n_blocks // 10, 10), block))
+    plt.close(fig)
+
+    for result in results:
+        result['channels'] = num_channels
+    return results
+
+
+def end_to_end(num_channels, packets, rate, workdir):
+    """
+    GloveStream fed by a ReplayClient, consumed like the AngleFilter
+    visualiser: resample, filter, map angles, detect touches, record
+    and draw. Latency is from notification to the end of the frame that
+    drew the sample. Not traced with tracemalloc, which would skew the
+    timings; memory is the process's peak RSS instead.
+    """
+    duration = packets / (rate or 1000.0)
+    replay = ReplayClient(synthetic_source(num_channels, rate=rate or 1000.0, duration=duration),
+                          speed=1 if rate else 0)
+    stream = GloveStream(replay=replay)
+    # Bounded like record's: a replay at full speed is held back, not queued without limit
+    samples = stream.subscribe(maxsize=4096, policy=BLOCK, name='bench')
+    stop_event = threading.Event()
+
+    mapper = AngleMapper(np.tile([-0.004, 780.0], (FINGERS, 1)), buffer_size=1000)
+    touch = TouchDetector(range(FINGERS, 2 * FINGERS))
+    smoother = MovingAverage(11, num_channels)
+    resampler = Resampler(60, num_channels)
+    time_buffer = RingBuffer(1000, 1)
+    filtered_buffer = RingBuffer(1000, num_channels)
+    header = ['Timestamp_ns'] + [f'Channel_{i+1}' for i in range(num_channels)]
+    recorder = CsvRecorder(os.path.join(workdir, f'bench_e2e_{num_channels}.csv'), header, clock=stream.clock,
+                           block_timeout=1.0)
+
+    fig, ax = plt.subplots()
+    lines = [ax.plot([], [])[0] for _ in range(FINGERS)]
+    renderer = BlitRenderer(fig)
+    renderer.add(ax, lines)
+
+    latencies = []
+    processed = 0
+    start = time.perf_counter()
+    thread = stream.start_thread(stop_event)
+    while True:
+        batch = samples.drain()
+        if batch:
+            timestamps = np.array([t for t, _ in batch], dtype=np.int64)
+            values = np.array([v for _, v in batch])
+            times, resampled = resampler.process(stream.clock.seconds(timestamps), values)
+            time_buffer.extend(times)
+            filtered = smoother.process(resampled)
+            filtered_buffer.extend(filtered)
+            recorder.write_samples(timestamps, values)
+            mapper.process(filtered)
+            touch.process(timestamps, values)
+            for f, line in enumerate(lines):
+                line.set_data(time_buffer.view()[:, 0], mapper.view()[:, f])
+            renderer.update(True)
+            latencies.append(time.monotonic_ns() - timestamps)
+            processed += len(batch)
+        elif replay.finished and samples.empty():
+            break
+        else:
+            time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    stop_event.set()
+    thread.join()
+    recorder.stop()
+    plt.close(fig)
+
+    latencies = np.concatenate(latencies) if latencies else np.zeros(1)
+    return {
+        'stage': 'end_to_end',
+        'channels': num_channels,
+        'offered_rate': rate or None,
+        'packets': processed,
+        'packets_per_sec': processed / elapsed,
+        'p50_us': float(np.percentile(latencies, 50)) / 1e3,
+        'p99_us': float(np.percentile(latencies, 99)) / 1e3,
+        'max_rss_kib': max_rss_kib(),
+        'full_draws': renderer.full_draws,
+        'blits': renderer.blits,
+        'dropped': samples.dropped,
+        'blocked': samples.blocked,
+        'dropped_rows': recorder.dropped_rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, nargs='+', default=[6, 10],
+                        help='channel counts to test (6 = current ADC_PINS)')
+    parser.add_argument('--packets', type=int, default=20000, help='packets per stage')
+    parser.add_argument('--block', type=int, default=32, help='samples per batch for the batch stages')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='offered packet rate for the end-to-end run, 0 = as fast as possible')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    # Keep the pipeline's progress messages out of the JSON on stdout
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(sys.stderr):
+        for num_channels in args.channels:
+            results += stage_benchmarks(num_channels, args.packets, args.block, workdir)
+            results.append(end_to_end(num_channels, args.packets, args.rate, workdir))
+
+    report = {
+        'config': vars(args),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
+import os
 import numpy as np
-import csv
-import pandas as pd
 import matplotlib.pyplot as plt
+from Glove_fit import LUT_FILE, AngleTable
+from Glove_session import load_session
 
 
-data = pd.read_csv('adc_data_20250623_130130.csv')
-data.head() # to display the first 5 lines of loaded data
-data[data.columns[[4,5,6]]].mean(0)
+recording = 'adc_data_20250623_130130'
+if os.path.isdir(recording + '.glv'):
+    # Converted session (python Glove_session.py): memory-mapped, nothing to parse
+    session = load_session(recording + '.glv')
+    session.channels[:, [3,4,5]].mean(0)
+else:
+    import pandas as pd
+    data = pd.read_csv(recording + '.csv', comment='#')  # skip '# gap' marker rows
+    data.head() # to display the first 5 lines of loaded data
+    data[data.columns[[4,5,6]]].mean(0)
 angles = [0,45,90,110]
 FingerAngle = np.load('Finger_angle.npy')
 GloveCal = np.load('Glove_cal.npy')
@@ -15,6 +23,12 @@ figure = plt.figure()
 for i in range(3):
     plt.scatter(angles,FingerAngle[i])
     plt.plot(angles, (angles-+ GloveCal[i][1])/GloveCal[i][0] )
+if os.path.exists(LUT_FILE):
+    # The nonlinear calibration, where it isn't clipped
+    table = AngleTable.load(LUT_FILE)
+    for i in range(3):
+        inside = (table.values[i] > table.lower) & (table.values[i] < table.upper)
+        plt.plot(table.values[i][inside], np.linspace(table.lo[i], table.hi[i], table.size)[inside], '--')
 plt.xlabel("Angles (Degrees)")
 plt.ylabel("Calculated Resistance (Ohm)")
 plt.title("Calibration curves")